@@ -0,0 +1,171 @@
+from self_driving_team.util import *
+from self_driving_team.bitboard import *
+from self_driving_team.distance import MANHATTAN
+from self_driving_team.minimax import leaf_eval, leaf_eval_dist
+from self_driving_team.catapult import leaf_eval_catapult, leaf_eval_catapult_dist
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+"""
+vectorised leaf evaluation, scores a batch of sibling boards with numpy in one
+call instead of one python evaluation per leaf. everything here needs numpy,
+HAVE_NUMPY is False (and the search keeps evaluating leaves one at a time)
+when it is not installed
+"""
+
+HAVE_NUMPY = np is not None
+
+if HAVE_NUMPY:
+    _BITS = np.arange(NUM_SQUARES, dtype=np.uint64)
+
+    # DISTANCES[i, j] is manhattan_distance between squares i and j
+    DISTANCES = np.array(MANHATTAN)
+
+"""
+encodes (white, black, heights) board states as an N x 2 x 8 x 8 array of
+stack heights, plane 0 is white and plane 1 black, indexed [y, x]
+"""
+def encode_boards(states):
+    white = np.array([state[0] for state in states], dtype=np.uint64)
+    black = np.array([state[1] for state in states], dtype=np.uint64)
+    heights = np.array([state[2] for state in states], dtype=np.int8)
+
+    planes = np.empty((len(states), 2, NUM_SQUARES), dtype=np.int8)
+    planes[:, 0] = heights * ((white[:, None] >> _BITS) & 1).astype(np.int8)
+    planes[:, 1] = heights * ((black[:, None] >> _BITS) & 1).astype(np.int8)
+    return planes.reshape(len(states), 2, BOARD_SIZE, BOARD_SIZE)
+
+"""
+encodes the boards after each of moves on board as an N x 2 x 8 x 8 array,
+like encode_boards but built from the parent board with array updates,
+without making any of the moves
+"""
+def encode_children(board, moves):
+    parent = np.empty((2, NUM_SQUARES), dtype=np.int8)
+    heights = np.array(board.heights, dtype=np.int8)
+    parent[0] = heights * ((np.uint64(board.white) >> _BITS) & 1).astype(np.int8)
+    parent[1] = heights * ((np.uint64(board.black) >> _BITS) & 1).astype(np.int8)
+    planes = np.repeat(parent[None], len(moves), axis=0)
+
+    rows = []
+    colours = []
+    old = []
+    new = []
+    sizes = []
+    boom_rows = []
+    regions = []
+    for i, move in enumerate(moves):
+        if move[0] == "MOVE":
+            old_sq = to_square(move[2])
+            rows.append(i)
+            colours.append(0 if board.white >> old_sq & 1 else 1)
+            old.append(old_sq)
+            new.append(to_square(move[3]))
+            sizes.append(move[1])
+        else:
+            boom_rows.append(i)
+            regions.append(board.blast(to_square(move[1]))[0])
+
+    if rows:
+        sizes = np.array(sizes, dtype=np.int8)
+        planes[rows, colours, old] -= sizes
+        planes[rows, colours, new] += sizes
+    if boom_rows:
+        removed = ((np.array(regions, dtype=np.uint64)[:, None] >> _BITS) & 1).astype(bool)
+        planes[boom_rows] *= ~removed[:, None, :]
+
+    return planes.reshape(len(moves), 2, BOARD_SIZE, BOARD_SIZE)
+
+"""
+token count of each colour, (num_white, num_black) arrays of length N
+"""
+def batch_material(planes):
+    counts = planes.reshape(len(planes), 2, NUM_SQUARES).sum(axis=2, dtype=np.int32)
+    return counts[:, 0], counts[:, 1]
+
+"""
+shortest white to black distance on each board, as eval_zero measures it
+(14 when a colour has no tokens)
+"""
+def batch_shortest_distance(planes):
+    flat = planes.reshape(len(planes), 2, NUM_SQUARES) > 0
+    pairs = flat[:, 0, :, None] & flat[:, 1, None, :]
+    return np.where(pairs, DISTANCES, 14).min(axis=(1, 2))
+
+"""
+tallest stack of each colour, (max_white, max_black) arrays of length N
+"""
+def batch_max_stack(planes):
+    tallest = planes.reshape(len(planes), 2, NUM_SQUARES).max(axis=2)
+    return tallest[:, 0], tallest[:, 1]
+
+"""
+material, shortest white-black distance and tallest stacks for a whole batch
+"""
+def batch_features(planes):
+    num_white, num_black = batch_material(planes)
+    max_white, max_black = batch_max_stack(planes)
+    return {
+        "num_white": num_white,
+        "num_black": num_black,
+        "shortest_distance": batch_shortest_distance(planes),
+        "max_white": max_white,
+        "max_black": max_black,
+    }
+
+"""
+batch versions of the leaf evaluators, same scores as the one-board versions
+"""
+def _material_score(planes, max_player_colour):
+    num_white, num_black = batch_material(planes)
+    if max_player_colour == "white":
+        return (num_white - num_black).astype(float)
+    return (num_black - num_white).astype(float)
+
+def _catapult_score(planes, colour):
+    max_white, max_black = batch_max_stack(planes)
+    max_size = max_white if colour == "white" else max_black
+    return np.where(max_size == 1, 0.0, max_size/12)
+
+def batch_leaf_eval(planes, max_player_colour, colour):
+    return _material_score(planes, max_player_colour)
+
+def batch_leaf_eval_dist(planes, max_player_colour, colour):
+    score = _material_score(planes, max_player_colour)
+    zero = score == 0
+    if zero.any():
+        score[zero] = 1 - batch_shortest_distance(planes[zero])/14
+    return score
+
+def batch_leaf_eval_catapult(planes, max_player_colour, colour):
+    score = _material_score(planes, max_player_colour)
+    zero = score == 0
+    if zero.any():
+        score[zero] = _catapult_score(planes[zero], colour)
+    return score
+
+def batch_leaf_eval_catapult_dist(planes, max_player_colour, colour):
+    score = batch_leaf_eval_catapult(planes, max_player_colour, colour)
+    zero = score == 0
+    if zero.any():
+        score[zero] = 1 - batch_shortest_distance(planes[zero])/14
+    return score
+
+# batch version of each leaf evaluator
+BATCH_EVALUATORS = {
+    leaf_eval: batch_leaf_eval,
+    leaf_eval_dist: batch_leaf_eval_dist,
+    leaf_eval_catapult: batch_leaf_eval_catapult,
+    leaf_eval_catapult_dist: batch_leaf_eval_catapult_dist,
+}
+
+"""
+the batch version of a leaf evaluator, None if there is none or numpy is missing
+"""
+def batch_evaluator_for(evaluator):
+    if not HAVE_NUMPY:
+        return None
+    return BATCH_EVALUATORS.get(evaluator)
@@ -0,0 +1,180 @@
+from self_driving_team.util import *
+from self_driving_team.bitboard import *
+from self_driving_team.batch_eval import HAVE_NUMPY, encode_boards
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+"""
+vectorised random playouts, N boards kept as one N x 2 x 8 x 8 array of stack
+heights (the batch_eval encoding) and played a ply at a time with array
+operations, booms and their chains included. used as a sampled evaluator
+for the search and to generate positions with known outcomes for tuning.
+needs numpy like batch_eval.py, check HAVE_NUMPY first
+
+each ply a board picks one of its own stacks at random and then one of that
+stack's moves at random, the BOOM or any MOVE (every size, every square in
+reach not held by the enemy)
+"""
+
+# plies a playout runs before it is cut off and scored on material
+PLAYOUT_PLIES = 40
+
+# colour index of the planes
+WHITE = 0
+BLACK = 1
+
+if HAVE_NUMPY:
+    # TARGETS[sq, n] are the squares a stack of n on sq can move to, padded
+    # with -1 to a fixed width
+    _targets = [[[t for squares in STEPS[sq][:n] for t in squares]
+                 for n in range(MAX_STACK+1)] for sq in range(NUM_SQUARES)]
+    _width = max(len(t) for row in _targets for t in row)
+    TARGETS = np.full((NUM_SQUARES, MAX_STACK+1, _width), -1, dtype=np.intp)
+    for sq, row in enumerate(_targets):
+        for n, targets in enumerate(row):
+            TARGETS[sq, n, :len(targets)] = targets
+
+    # BLAST_MATRIX[i, j] is 1 when square j is in the blast radius of i, so a
+    # row vector of exploding squares times it gives the squares they reach
+    BLAST_MATRIX = np.array([[BLAST[i] >> j & 1 for j in range(NUM_SQUARES)]
+                             for i in range(NUM_SQUARES)], dtype=np.float32)
+
+"""
+the squares each BOOM removes, as an N x 64 bool array, flood filling the
+blast radius through the occupied squares like blast_region, one ring of
+explosions per step for every board at once
+"""
+def batch_blast(occupied, squares):
+    region = np.zeros(occupied.shape, dtype=bool)
+    region[np.arange(len(squares)), squares] = True
+    while True:
+        grown = (region.astype(np.float32) @ BLAST_MATRIX > 0) & occupied | region
+        if (grown == region).all():
+            return region
+        region = grown
+
+"""
+plays random moves on every board of planes (N x 2 x 8 x 8, changed in
+place) with movers (array of WHITE/BLACK) to move, until each game is over
+or has run plies plies (an int or one per board). returns (outcome, movers):
+outcome 1 where white won, -1 where black won and 0 for draws and games cut
+off, movers the colour to move on each board at the end
+"""
+def random_playouts(planes, movers, plies=PLAYOUT_PLIES, rng=None):
+    if rng is None:
+        rng = np.random.default_rng()
+    count = len(planes)
+    flat = planes.reshape(count, 2, NUM_SQUARES)
+    movers = np.array(movers, dtype=np.intp)
+    remaining = np.broadcast_to(plies, (count,)).copy()
+
+    while True:
+        totals = flat.sum(axis=2)
+        live = np.flatnonzero((totals > 0).all(axis=1) & (remaining > 0))
+        if not len(live):
+            break
+
+        boards = flat[live]
+        rows = np.arange(len(live))
+        mover = movers[live]
+        own = boards[rows, mover]
+        enemy = boards[rows, 1 - mover]
+
+        # a random stack of the side to move
+        keys = rng.random(own.shape)
+        keys[own == 0] = -1
+        squares = keys.argmax(axis=1)
+        heights = own[rows, squares]
+
+        # the squares it can move to
+        targets = TARGETS[squares, heights]
+        valid = targets >= 0
+        targets = np.where(valid, targets, 0)
+        valid &= enemy[rows[:, None], targets] == 0
+        num_targets = valid.sum(axis=1)
+
+        # one of the stack's 1 + n*targets moves, all equally likely
+        boom = rng.random(len(live)) * (1 + heights*num_targets) < 1
+
+        move = ~boom
+        if move.any():
+            keys = rng.random(targets.shape)
+            keys[~valid] = -1
+            to = targets[rows, keys.argmax(axis=1)]
+            sizes = (rng.random(len(live)) * heights).astype(boards.dtype) + 1
+            moved = rows[move]
+            boards[moved, mover[move], squares[move]] -= sizes[move]
+            boards[moved, mover[move], to[move]] += sizes[move]
+
+        if boom.any():
+            boomed = rows[boom]
+            occupied = boards[boomed].sum(axis=1) > 0
+            region = batch_blast(occupied, squares[boom])
+            boards[boomed] *= ~region[:, None, :]
+
+        flat[live] = boards
+        movers[live] = 1 - mover
+        remaining[live] -= 1
+
+    totals = flat.sum(axis=2)
+    outcome = np.where(totals[:, 1] == 0, 1, 0) - np.where(totals[:, 0] == 0, 1, 0)
+    return outcome.astype(np.int8), movers
+
+"""
+white's score of each finished or cut off playout, the outcome for finished
+games and the material difference over 2*MAX_STACK (inside -0.5 to 0.5) for
+the rest
+"""
+def white_scores(planes, outcome):
+    totals = planes.reshape(len(planes), 2, NUM_SQUARES).sum(axis=2)
+    finished = (totals == 0).any(axis=1)
+    material = (totals[:, 0] - totals[:, 1]) / (2*MAX_STACK)
+    return np.where(finished, outcome, material)
+
+"""
+playouts random playouts from board with colour to move, returns (outcome,
+planes) with the end boards
+"""
+def board_playouts(board, colour, playouts, plies=PLAYOUT_PLIES, rng=None):
+    planes = np.repeat(encode_boards([(board.white, board.black, board.heights)]), playouts, axis=0)
+    movers = np.full(playouts, WHITE if colour == "white" else BLACK)
+    outcome, movers = random_playouts(planes, movers, plies, rng)
+    return outcome, planes
+
+"""
+a leaf evaluator for the search that scores a board by the average result of
+playouts random playouts from it, between -1 and 1 for max_player_colour
+"""
+def sampled_evaluator(playouts=64, plies=PLAYOUT_PLIES, seed=None):
+    rng = np.random.default_rng(seed)
+
+    def evaluate(board, max_player_colour, colour):
+        outcome, planes = board_playouts(board, colour, playouts, plies, rng)
+        score = float(white_scores(planes, outcome).mean())
+        return score if max_player_colour == "white" else -score
+
+    return evaluate
+
+"""
+positions with known results for tuning the evaluators: count random games
+from the opening, each one sampled after a random number of plies (under
+plies) and then played out to the end or until max_plies in all. returns
+(planes, movers, scores): the sampled boards, the colour to move on each and
+the white_scores the games went on to reach
+"""
+def training_samples(count, plies=PLAYOUT_PLIES, max_plies=4*PLAYOUT_PLIES, rng=None):
+    if rng is None:
+        rng = np.random.default_rng()
+    board = Board.from_dict(init_board())
+    planes = np.repeat(encode_boards([(board.white, board.black, board.heights)]), count, axis=0)
+    sample_plies = rng.integers(0, plies, count)
+
+    outcome, movers = random_playouts(planes, np.full(count, WHITE), sample_plies, rng)
+    samples = planes.copy()
+    sample_movers = movers.copy()
+
+    outcome, movers = random_playouts(planes, movers, max_plies - sample_plies, rng)
+    return samples, sample_movers, white_scores(planes, outcome)
@@ -0,0 +1,202 @@
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+from self_driving_team.util import *
+from self_driving_team.bitboard import *
+from self_driving_team.transposition import *
+from self_driving_team.ordering import *
+from self_driving_team.search import *
+from self_driving_team.minimax import *
+from self_driving_team.catapult import *
+from self_driving_team.batch_eval import HAVE_NUMPY
+from self_driving_team.batch_rollout import board_playouts
+
+"""
+benchmarks of the hot paths on a fixed set of positions: move generation,
+make/unmake (booms included), every leaf evaluator, fixed depth searches and
+the numpy random playouts.
+results can be saved as a baseline and later runs compared against it
+
+    python -m self_driving_team.bench --save baseline.json
+    python -m self_driving_team.bench --baseline baseline.json --threshold 0.2
+
+metric names end in their unit, _us and _s are times, _bytes and
+_retained_blocks memory, all lower is better, _per_s rates where higher is
+better
+"""
+
+# the position corpus, (name, board_dict, colour to move)
+CORPUS = [
+    ("opening", init_board(), "white"),
+
+    # both armies spread over the middle with a few stacks, few booms reach far
+    ("midgame", {
+        (0, 0): "W 1", (1, 1): "W 2", (3, 2): "W 1", (4, 1): "W 3", (6, 2): "W 1",
+        (7, 0): "W 2", (2, 3): "W 1", (5, 3): "W 1",
+        (0, 7): "B 2", (1, 5): "B 1", (3, 5): "B 1", (4, 6): "B 3", (6, 5): "B 2",
+        (7, 7): "B 1", (2, 4): "B 1", (5, 5): "B 1",
+    }, "white"),
+
+    # tightly packed mixed cluster, most booms chain through it
+    ("booms", {
+        (2, 2): "W 1", (3, 2): "B 1", (4, 2): "W 2", (5, 2): "B 1",
+        (2, 3): "B 2", (3, 3): "W 1", (4, 3): "B 1", (5, 3): "W 1",
+        (2, 4): "W 1", (3, 4): "B 1", (4, 4): "W 1", (5, 4): "B 2",
+        (0, 0): "W 3", (7, 7): "B 3", (0, 7): "W 1", (7, 0): "B 1",
+    }, "white"),
+
+    # few tall stacks far apart
+    ("endgame", {
+        (1, 1): "W 3", (6, 2): "W 1",
+        (5, 6): "B 2", (2, 5): "B 1",
+    }, "black"),
+]
+
+# leaf evaluators to time, by name
+EVALUATORS = [
+    ("leaf_eval", leaf_eval),
+    ("leaf_eval_dist", leaf_eval_dist),
+    ("leaf_eval_catapult", leaf_eval_catapult),
+    ("leaf_eval_catapult_dist", leaf_eval_catapult_dist),
+]
+
+# fixed depth searches to time, (evaluator name, depth)
+SEARCHES = [("leaf_eval_catapult_dist", 3), ("leaf_eval", 4)]
+
+# random playouts per timed batch
+PLAYOUTS = 4096
+
+"""
+seconds per call of fn, the best of repeat runs of number calls each
+"""
+def best_time(fn, number, repeat=5):
+    best = None
+    for r in range(repeat):
+        start = time.perf_counter()
+        for i in range(number):
+            fn()
+        elapsed = (time.perf_counter() - start) / number
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+"""
+the searcher SearchPlayer builds for a fixed depth player
+"""
+def make_search(evaluator):
+    return Search(evaluator, tt=TranspositionTable(), orderer=MoveOrderer())
+
+def bench_moves(board, colour, name, metrics, number):
+    metrics[name + "/all_moves_us"] = 1e6*best_time(lambda: board.all_moves(colour), number)
+
+    # every move once, booms and their chains included
+    moves = board.all_moves(colour)
+    def make_unmake():
+        for move in moves:
+            board.unmake_move(board.make_move(move))
+    metrics[name + "/make_unmake_us"] = 1e6*best_time(make_unmake, number) / len(moves)
+
+def bench_evaluators(board, colour, name, metrics, number):
+    for eval_name, evaluator in EVALUATORS:
+        def evaluate():
+            evaluator(board, colour, colour)
+        metrics["%s/%s_us" % (name, eval_name)] = 1e6*best_time(evaluate, number)
+
+def bench_searches(board, colour, name, metrics):
+    evaluators = dict(EVALUATORS)
+    for eval_name, depth in SEARCHES:
+        search = make_search(evaluators[eval_name])
+        prefix = "%s/search_%s_d%d" % (name, eval_name, depth)
+
+        start = time.perf_counter()
+        search.choose_move(board.copy(), colour, depth)
+        elapsed = time.perf_counter() - start
+        metrics[prefix + "_s"] = elapsed
+        metrics[prefix + "_nodes_per_s"] = search.nodes / elapsed
+
+        # memory on a second run, tracemalloc slows everything down. the
+        # blocks are the ones the search leaves allocated (mostly its
+        # tables), tracemalloc can not count the ones freed along the way
+        search = make_search(evaluators[eval_name])
+        search_board = board.copy()
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        search.choose_move(search_board, colour, depth)
+        after = tracemalloc.take_snapshot()
+        metrics[prefix + "_peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        metrics[prefix + "_retained_blocks"] = sum(stat.count_diff for stat in after.compare_to(before, "filename"))
+        tracemalloc.stop()
+
+def bench_playouts(board, colour, name, metrics):
+    seconds = best_time(lambda: board_playouts(board, colour, PLAYOUTS), 1, repeat=3)
+    metrics[name + "/playouts_per_s"] = PLAYOUTS / seconds
+
+"""
+runs every benchmark on every position of the corpus, returns {metric: value}
+"""
+def run_benchmarks(number=200, searches=True):
+    metrics = {}
+    for name, board_dict, colour in CORPUS:
+        board = Board.from_dict(board_dict)
+        bench_moves(board, colour, name, metrics, number)
+        bench_evaluators(board, colour, name, metrics, number*10)
+        if searches:
+            bench_searches(board, colour, name, metrics)
+        if HAVE_NUMPY:
+            bench_playouts(board, colour, name, metrics)
+    return metrics
+
+def higher_is_better(metric):
+    return metric.endswith("_per_s")
+
+"""
+metrics worse than the baseline by more than threshold (a fraction), as a
+list of (metric, baseline, value, change). metrics missing from either side
+are skipped
+"""
+def regressions(metrics, baseline, threshold=0.2):
+    found = []
+    for metric, value in sorted(metrics.items()):
+        base = baseline.get(metric)
+        if not base:
+            continue
+        change = (value - base) / base
+        if higher_is_better(metric):
+            change = -change
+        if change > threshold:
+            found.append((metric, base, value, change))
+    return found
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="benchmark the move generation, evaluation and search")
+    parser.add_argument("--baseline", help="baseline json to compare against")
+    parser.add_argument("--save", help="write the results to this json file")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown, 0.2 = 20%%")
+    parser.add_argument("--number", type=int, default=200, help="calls per timing run")
+    parser.add_argument("--no-search", action="store_true", help="skip the full searches")
+    args = parser.parse_args(argv)
+
+    metrics = run_benchmarks(args.number, not args.no_search)
+    for metric, value in sorted(metrics.items()):
+        print("%-60s %14.3f" % (metric, value))
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(metrics, f, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        found = regressions(metrics, baseline, args.threshold)
+        for metric, base, value, change in found:
+            print("REGRESSION %s: %.3f -> %.3f (%+.0f%%)" % (metric, base, value, 100*change))
+        if found:
+            sys.exit(1)
+        print("no regressions over %.0f%%" % (100*args.threshold))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,458 @@
+from itertools import islice
+from self_driving_team.util import *
+from self_driving_team.transposition import ZOBRIST_WHITE, ZOBRIST_BLACK, SIDE_KEY
+
+"""
+bitboard representation of the 8x8 expendibots board
+
+square index for position (x, y) is x + 8*y, bit i of the white/black mask is
+set when that square holds a stack of that colour, heights[i] is the stack size
+"""
+
+BOARD_SIZE = 8
+NUM_SQUARES = 64
+MAX_STACK = 12
+
+"""
+converts an (x, y) position to a square index
+"""
+def to_square(pos):
+    x, y = pos
+    return x + BOARD_SIZE*y
+
+"""
+converts a square index back to an (x, y) position
+"""
+def to_pos(sq):
+    return (sq % BOARD_SIZE, sq // BOARD_SIZE)
+
+# (x, y) tuple for every square, so move generation never rebuilds them
+POSITIONS = [to_pos(sq) for sq in range(NUM_SQUARES)]
+
+# every bit on the board, and the squares on the x = 0 and x = 7 edges
+FULL = (1 << NUM_SQUARES) - 1
+EDGE_0 = sum(1 << to_square((0, y)) for y in range(BOARD_SIZE))
+EDGE_7 = sum(1 << to_square((7, y)) for y in range(BOARD_SIZE))
+
+"""
+grows a mask by one square in all 8 directions
+"""
+def dilate(mask):
+    row = (mask | mask << 1 & ~EDGE_0 | mask >> 1 & ~EDGE_7) & FULL
+    return (row | row << BOARD_SIZE | row >> BOARD_SIZE) & FULL
+
+# BLAST[sq] is the 3x3 blast radius around sq, including sq
+BLAST = [dilate(1 << sq) for sq in range(NUM_SQUARES)]
+
+"""
+mask of the stacks a BOOM on sq removes, flood filling the blast radius
+through the occupied squares one ring of explosions at a time instead of
+recursing per stack
+"""
+def blast_region(occupied, sq):
+    region = BLAST[sq] & occupied | 1 << sq
+    while True:
+        grown = dilate(region) & occupied
+        if grown == region:
+            return region
+        region = grown
+
+# distance reported when there is nothing to measure to (max possible = 14)
+NO_DISTANCE = 14
+
+"""
+grows a mask by one square up, down, left and right
+"""
+def grow(mask):
+    return (mask | mask << 1 & ~EDGE_0 | mask >> 1 & ~EDGE_7
+            | mask << BOARD_SIZE | mask >> BOARD_SIZE) & FULL
+
+"""
+shortest manhattan distance between any square of mask1 and any square of
+mask2, by growing mask1 one step at a time until it touches mask2. at most 14
+steps of a few bit operations, whatever the number of tokens
+"""
+def shortest_distance(mask1, mask2):
+    if not mask1 or not mask2:
+        return NO_DISTANCE
+    dist = 0
+    while not mask1 & mask2:
+        mask1 = grow(mask1)
+        dist += 1
+    return dist
+
+"""
+squares a stack on sq reaches moving i steps, for i = 1..12, in the order
++x, -x, +y, -y that get_moveable_tiles uses (off-board squares left out)
+"""
+def _steps(sq):
+    x, y = to_pos(sq)
+    steps = []
+    for i in range(1, MAX_STACK+1):
+        squares = []
+        for nx, ny in ((x+i, y), (x-i, y), (x, y+i), (x, y-i)):
+            if 0 <= nx < BOARD_SIZE and 0 <= ny < BOARD_SIZE:
+                squares.append(to_square((nx, ny)))
+        steps.append(tuple(squares))
+    return steps
+
+# STEPS[sq][i-1] is the squares i steps away from sq
+STEPS = [_steps(sq) for sq in range(NUM_SQUARES)]
+
+"""
+mask of every square a stack of n tokens on sq can move to
+"""
+def _reach(sq, n):
+    mask = 0
+    for squares in STEPS[sq][:n]:
+        for target in squares:
+            mask |= 1 << target
+    return mask
+
+# REACH[sq][n] for n = 0..12
+REACH = [[_reach(sq, n) for n in range(MAX_STACK+1)] for sq in range(NUM_SQUARES)]
+
+# move lists of single stacks, keyed by square, height and the enemy stacks in
+# reach, which is all a stack's moves depend on. a move only changes the keys
+# of the stacks whose reach it touched, every other stack keeps hitting its
+# list through make_move and unmake_move
+MOVE_CACHE = {}
+MOVE_CACHE_SIZE = 1 << 18
+
+# move codes fit in 16 bits: n << 12 | from << 6 | to for a MOVE of n tokens
+# (n is 1..12), BOOM_CODE | sq for a BOOM, and 0 for no move
+BOOM_CODE = 0xF000
+
+"""
+packs a move into a 16 bit int, for tables that store fixed size entries
+"""
+def encode_move(move):
+    if not move:
+        return 0
+    if move[0] == "BOOM":
+        return BOOM_CODE | to_square(move[1])
+    return move[1] << 12 | to_square(move[2]) << 6 | to_square(move[3])
+
+"""
+the move packed by encode_move, "" for 0
+"""
+def decode_move(code):
+    if not code:
+        return ""
+    if code & BOOM_CODE == BOOM_CODE:
+        return ("BOOM", POSITIONS[code & 63])
+    return ("MOVE", code >> 12, POSITIONS[code >> 6 & 63], POSITIONS[code & 63])
+
+"""
+yields the square index of every set bit in mask, lowest first
+"""
+def iter_squares(mask):
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class Board:
+    """
+    Compact board engine: one occupancy mask per colour plus a list of stack
+    heights, with a zobrist hash of the stacks and the evaluation state that
+    make_move and unmake_move keep up to date: token counts, a histogram of
+    stack heights per colour (white_stacks[h] is the number of white stacks
+    of height h). The shortest white-black distance is measured from the
+    masks when it is asked for.
+    """
+
+    def __init__(self):
+        self.white = 0
+        self.black = 0
+        self.heights = [0] * NUM_SQUARES
+        self.num_white = 0
+        self.num_black = 0
+        self.hash = 0
+        self.white_stacks = [0] * (MAX_STACK+1)
+        self.black_stacks = [0] * (MAX_STACK+1)
+
+    @classmethod
+    def from_dict(cls, board_dict):
+        """Builds a board from a board_dict with values like "W 3"."""
+        board = cls()
+        for pos, str in board_dict.items():
+            sq = to_square(pos)
+            n = get_num(str)
+            board.heights[sq] = n
+            if str[0] == 'W':
+                board.white |= 1 << sq
+                board.num_white += n
+                board.white_stacks[n] += 1
+                board.hash ^= ZOBRIST_WHITE[sq][n]
+            else:
+                board.black |= 1 << sq
+                board.num_black += n
+                board.black_stacks[n] += 1
+                board.hash ^= ZOBRIST_BLACK[sq][n]
+        return board
+
+    def to_dict(self):
+        """Returns the equivalent board_dict, e.g. for print_board."""
+        board_dict = {}
+        for sq in iter_squares(self.white):
+            board_dict[POSITIONS[sq]] = "W " + str(self.heights[sq])
+        for sq in iter_squares(self.black):
+            board_dict[POSITIONS[sq]] = "B " + str(self.heights[sq])
+        return board_dict
+
+    def copy(self):
+        board = Board.__new__(Board)
+        board.white = self.white
+        board.black = self.black
+        board.heights = self.heights[:]
+        board.num_white = self.num_white
+        board.num_black = self.num_black
+        board.hash = self.hash
+        board.white_stacks = self.white_stacks[:]
+        board.black_stacks = self.black_stacks[:]
+        return board
+
+    def __eq__(self, other):
+        return (isinstance(other, Board) and self.white == other.white
+                and self.black == other.black and self.heights == other.heights)
+
+    def key(self, colour):
+        """Zobrist key of this position with colour to move."""
+        if colour == "black":
+            return self.hash ^ SIDE_KEY
+        return self.hash
+
+    def occupancy(self, colour):
+        """Mask of the squares holding stacks of the given colour."""
+        if colour == "white":
+            return self.white
+        return self.black
+
+    def all_moves(self, colour, unique_booms=False):
+        """
+        All moves for a colour, in the same format as util.all_moves.
+
+        Every stack in the same connected group explodes the same stacks, so
+        with unique_booms only the first stack of each group gets a BOOM. The
+        full set (the default) is what the referee accepts as legal moves.
+        """
+        own = self.occupancy(colour)
+        enemy = self.black if colour == "white" else self.white
+        moves = []
+        if not unique_booms:
+            for sq in iter_squares(own):
+                moves.extend(self.avail_moves(sq, enemy))
+            return moves
+
+        occupied = self.white | self.black
+        boomed = 0
+        for sq in iter_squares(own):
+            stack_moves = self.avail_moves(sq, enemy)
+            if boomed >> sq & 1:
+                moves.extend(islice(stack_moves, 1, None))
+            else:
+                boomed |= blast_region(occupied, sq)
+                moves.extend(stack_moves)
+        return moves
+
+    def iter_moves(self, colour, unique_booms=False):
+        """Yields the moves of all_moves one stack at a time."""
+        own = self.occupancy(colour)
+        enemy = self.black if colour == "white" else self.white
+        occupied = self.white | self.black
+        boomed = 0
+        for sq in iter_squares(own):
+            stack_moves = self.avail_moves(sq, enemy)
+            if unique_booms and boomed >> sq & 1:
+                yield from islice(stack_moves, 1, None)
+            else:
+                if unique_booms:
+                    boomed |= blast_region(occupied, sq)
+                yield from stack_moves
+
+    def avail_moves(self, sq, enemy):
+        """
+        All moves for the stack on sq, a BOOM followed by its MOVEs. The list
+        is shared through MOVE_CACHE and must not be modified.
+        """
+        n = self.heights[sq]
+        key = (enemy & REACH[sq][n]) << 10 | n << 6 | sq
+        moves = MOVE_CACHE.get(key)
+        if moves is not None:
+            return moves
+
+        pos = POSITIONS[sq]
+
+        # boom is always an option
+        moves = [("BOOM", pos)]
+
+        # tiles not held by the enemy, same order as get_moveable_tiles
+        tiles = []
+        for squares in STEPS[sq][:n]:
+            for target in squares:
+                if not enemy >> target & 1:
+                    tiles.append(POSITIONS[target])
+
+        for i in range(1, n+1):
+            for tile in tiles:
+                moves.append(("MOVE", i, pos, tile))
+
+        if len(MOVE_CACHE) >= MOVE_CACHE_SIZE:
+            MOVE_CACHE.clear()
+        MOVE_CACHE[key] = moves
+        return moves
+
+    def is_legal(self, move, colour):
+        """Checks a move (e.g. from the transposition table) for colour."""
+        own = self.occupancy(colour)
+        if move[0] == "BOOM":
+            return bool(own >> to_square(move[1]) & 1)
+
+        n, old_pos, new_pos = move[1], move[2], move[3]
+        if not (0 <= new_pos[0] < BOARD_SIZE and 0 <= new_pos[1] < BOARD_SIZE):
+            return False
+        old_sq = to_square(old_pos)
+        new_sq = to_square(new_pos)
+        if not own >> old_sq & 1 or not 1 <= n <= self.heights[old_sq]:
+            return False
+        enemy = self.black if colour == "white" else self.white
+        return bool(REACH[old_sq][self.heights[old_sq]] >> new_sq & 1) and not enemy >> new_sq & 1
+
+    def make_move(self, move):
+        """
+        Applies a MOVE or BOOM to this board in place and returns the undo
+        record that unmake_move needs to restore it exactly.
+        """
+        undo = (self.white, self.black, self.num_white, self.num_black, self.hash, [])
+        if move[0] == "BOOM":
+            self.boom(to_square(move[1]), undo[5])
+        elif move[0] == "MOVE":
+            self.move_stack(move[1], to_square(move[2]), to_square(move[3]), undo[5])
+        return undo
+
+    def unmake_move(self, undo):
+        """Restores the board to how it was before the matching make_move."""
+        white, black, self.num_white, self.num_black, self.hash, changed = undo
+        heights = self.heights
+
+        # take the changed stacks out of the histograms and put the old ones back
+        for sq, n in changed:
+            if heights[sq]:
+                if self.white >> sq & 1:
+                    self.white_stacks[heights[sq]] -= 1
+                else:
+                    self.black_stacks[heights[sq]] -= 1
+            if n:
+                if white >> sq & 1:
+                    self.white_stacks[n] += 1
+                else:
+                    self.black_stacks[n] += 1
+            heights[sq] = n
+
+        self.white = white
+        self.black = black
+
+    def move_stack(self, n, old_sq, new_sq, changed):
+        """Moves n tokens from old_sq onto new_sq (empty or friendly)."""
+        heights = self.heights
+        old_bit = 1 << old_sq
+        new_bit = 1 << new_sq
+        changed.append((old_sq, heights[old_sq]))
+        changed.append((new_sq, heights[new_sq]))
+
+        if self.white & old_bit:
+            keys = ZOBRIST_WHITE
+            stacks = self.white_stacks
+            self.white |= new_bit
+            if n == heights[old_sq]:
+                self.white ^= old_bit
+        else:
+            keys = ZOBRIST_BLACK
+            stacks = self.black_stacks
+            self.black |= new_bit
+            if n == heights[old_sq]:
+                self.black ^= old_bit
+
+        old_n = heights[old_sq]
+        new_n = heights[new_sq]
+        self.hash ^= (keys[old_sq][old_n] ^ keys[old_sq][old_n-n]
+                      ^ keys[new_sq][new_n] ^ keys[new_sq][new_n+n])
+
+        # height 0 entries count nothing, they just save a branch
+        stacks[old_n] -= 1
+        stacks[old_n-n] += 1
+        stacks[new_n] -= 1
+        stacks[new_n+n] += 1
+        stacks[0] = 0
+
+        heights[old_sq] = old_n - n
+        heights[new_sq] = new_n + n
+
+    def blast(self, sq):
+        """
+        Returns (region, white tokens, black tokens) that a BOOM on sq would
+        remove, without making it.
+        """
+        region = blast_region(self.white | self.black, sq)
+        heights = self.heights
+        white_removed = 0
+        black_removed = 0
+        for sq in iter_squares(region & self.white):
+            white_removed += heights[sq]
+        for sq in iter_squares(region & self.black):
+            black_removed += heights[sq]
+        return region, white_removed, black_removed
+
+    def boom(self, sq, changed):
+        """
+        Explodes the stack on sq and every stack caught in the chain, adds the
+        (square, height) of each removed stack to changed so it can be undone
+        and returns the (white, black) tokens removed.
+        """
+        region, white_removed, black_removed = self.blast(sq)
+        heights = self.heights
+
+        for sq in iter_squares(region & self.white):
+            changed.append((sq, heights[sq]))
+            self.hash ^= ZOBRIST_WHITE[sq][heights[sq]]
+            self.white_stacks[heights[sq]] -= 1
+            heights[sq] = 0
+        for sq in iter_squares(region & self.black):
+            changed.append((sq, heights[sq]))
+            self.hash ^= ZOBRIST_BLACK[sq][heights[sq]]
+            self.black_stacks[heights[sq]] -= 1
+            heights[sq] = 0
+
+        self.white &= ~region
+        self.black &= ~region
+        self.num_white -= white_removed
+        self.num_black -= black_removed
+        return white_removed, black_removed
+
+    def eval(self, colour):
+        """Material difference for colour, same as util.eval."""
+        return eval(colour, self.num_black, self.num_white)
+
+    def max_height(self, colour):
+        """Size of the tallest stack of a colour, 0 if it has none."""
+        stacks = self.white_stacks if colour == "white" else self.black_stacks
+        for n in range(MAX_STACK, 0, -1):
+            if stacks[n]:
+                return n
+        return 0
+
+    def shortest_distance(self):
+        """Shortest white-black manhattan distance, see shortest_distance."""
+        return shortest_distance(self.white, self.black)
+
+    def max_stack(self, colour):
+        """Position and size of the tallest stack of a colour."""
+        max_pos = None
+        max_size = 0
+        for sq in iter_squares(self.occupancy(colour)):
+            if self.heights[sq] > max_size:
+                max_pos = POSITIONS[sq]
+                max_size = self.heights[sq]
+        return max_pos, max_size
@@ -0,0 +1,104 @@
+import os
+import struct
+from self_driving_team.util import *
+from self_driving_team.bitboard import *
+from self_driving_team.transposition import *
+from self_driving_team.ordering import *
+from self_driving_team.search import *
+from self_driving_team.catapult import leaf_eval_catapult_dist
+from self_driving_team.tables import *
+
+"""
+opening book, the best move for every position in the first plies of a game
+searched offline and looked up by zobrist key during play
+
+build one with
+    python -m self_driving_team.make_book [--plies N] [--depth D] [--output PATH]
+"""
+
+BOOK_MAGIC = b"EXPBOOK1"
+
+# key, encoded move, depth it was searched to
+BOOK_RECORD = struct.Struct("<QHH")
+
+# where players look for the book, next to this module
+BOOK_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "opening.book")
+
+"""
+every (board, colour) reachable from the initial board in at most plies
+moves, white moving first, once per position
+"""
+def book_positions(plies):
+    board = Board.from_dict(init_board())
+    seen = {board.key("white")}
+    positions = [(board, "white")]
+    frontier = positions
+
+    for ply in range(plies):
+        next_frontier = []
+        for board, colour in frontier:
+            if board.num_white == 0 or board.num_black == 0:
+                continue
+            next_colour = colour_switch(colour)
+            for move in board.all_moves(colour, unique_booms=True):
+                child = board.copy()
+                child.make_move(move)
+                key = child.key(next_colour)
+                if key not in seen:
+                    seen.add(key)
+                    next_frontier.append((child, next_colour))
+        positions.extend(next_frontier)
+        frontier = next_frontier
+
+    return positions
+
+"""
+searches every position of the first plies to depth and writes the book to
+path, returns the number of positions
+"""
+def build_book(path, plies=2, depth=4, evaluator=leaf_eval_catapult_dist, progress=None):
+    search = Search(evaluator, tt=TranspositionTable(), orderer=MoveOrderer())
+    records = []
+    positions = book_positions(plies)
+    for i, (board, colour) in enumerate(positions):
+        move = search.choose_move(board, colour, depth)
+        if move:
+            records.append((board.key(colour), encode_move(move), depth))
+        if progress is not None:
+            progress(i+1, len(positions))
+    write_table(path, BOOK_MAGIC, BOOK_RECORD, records)
+    return len(records)
+
+
+class OpeningBook:
+    """
+    A book file mapped with mmap, probe() finds the move for a position
+    without ever reading the whole file.
+    """
+
+    def __init__(self, path=BOOK_FILE):
+        self.table = MappedTable(path, BOOK_MAGIC, BOOK_RECORD)
+
+    def probe(self, board, colour):
+        """The book move for colour to move on board, None when out of book."""
+        entry = self.table.find(board.key(colour))
+        if entry is None:
+            return None
+        move = decode_move(entry[1])
+
+        # a key collision can give a move from another position
+        if not board.is_legal(move, colour):
+            return None
+        return move
+
+    def close(self):
+        self.table.close()
+
+"""
+the book at path, None if there is no book there
+"""
+def load_book(path=BOOK_FILE):
+    if path is None or not os.path.exists(path):
+        return None
+    return OpeningBook(path)
+
@@ -0,0 +1,114 @@
+import time
+
+"""
+time control objects for the search, each has start() before a move, check()
+at every node, should_deepen() between iterations and stop() after the move
+"""
+
+"""
+raised inside a search when its deadline has passed, the iteration that was
+running is thrown away
+"""
+class SearchTimeout(Exception):
+    pass
+
+
+class GameClock:
+    """
+    Spreads a total time allowance for the game across our moves.
+
+    Each move gets the time left (minus a safety reserve) divided by the number
+    of moves we still expect to play, capped at max_budget. Only time spent in
+    our own action() calls is charged to the clock.
+    """
+
+    def __init__(self, total_time=60.0, moves_to_go=40, min_moves_to_go=10,
+                 reserve=1.0, min_budget=0.02, max_budget=3.0):
+        self.total_time = total_time
+        self.moves_to_go = moves_to_go
+        self.min_moves_to_go = min_moves_to_go
+        self.reserve = reserve
+        self.min_budget = min_budget
+        self.max_budget = max_budget
+
+        self.used = 0.0
+        self.moves_played = 0
+        self.move_start = None
+        self.deadline = None
+
+    def remaining(self):
+        return self.total_time - self.used
+
+    def budget(self):
+        """Seconds to spend on the next move."""
+        moves_left = max(self.moves_to_go - self.moves_played, self.min_moves_to_go)
+        budget = (self.remaining() - self.reserve) / moves_left
+        return max(self.min_budget, min(budget, self.max_budget))
+
+    def start(self):
+        """Starts timing a move, returns its deadline as a perf_counter time."""
+        self.move_start = time.perf_counter()
+        self.deadline = self.move_start + self.budget()
+        return self.deadline
+
+    def check(self):
+        """Raises SearchTimeout once the deadline of the move has passed."""
+        if time.perf_counter() > self.deadline:
+            raise SearchTimeout()
+
+    def should_deepen(self):
+        """
+        False once half the move's budget is spent, the next iteration takes
+        longer than all the ones before it and would most likely be thrown away
+        """
+        now = time.perf_counter()
+        return now - self.move_start < (self.deadline - self.move_start) / 2
+
+    def stop(self):
+        """Charges the time since start to the clock."""
+        self.used += time.perf_counter() - self.move_start
+        self.moves_played += 1
+        self.move_start = None
+
+
+class NoTimeLimit:
+    """
+    Time control for the fixed depth searches, never runs out.
+    """
+
+    def start(self):
+        return None
+
+    def check(self):
+        pass
+
+    def should_deepen(self):
+        return True
+
+    def stop(self):
+        pass
+
+
+class SharedDeadline:
+    """
+    Time control for the helper processes of a parallel search: runs until
+    the deadline (a perf_counter time, None for none) or until the main
+    search sets the shared stop flag.
+    """
+
+    def __init__(self, deadline, stop_flag):
+        self.deadline = deadline
+        self.stop_flag = stop_flag
+
+    def start(self):
+        return self.deadline
+
+    def check(self):
+        if self.stop_flag.value or self.deadline is not None and time.perf_counter() > self.deadline:
+            raise SearchTimeout()
+
+    def should_deepen(self):
+        return not self.stop_flag.value
+
+    def stop(self):
+        pass
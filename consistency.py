@@ -0,0 +1,310 @@
+import os
+import sys
+import random
+import argparse
+import tempfile
+from self_driving_team.util import *
+from self_driving_team.bitboard import *
+from self_driving_team.transposition import *
+from self_driving_team.ordering import *
+from self_driving_team.search import *
+from self_driving_team.parallel import RootParallelSearch
+from self_driving_team.minimax import *
+from self_driving_team.tables import write_table
+from self_driving_team.book import BOOK_MAGIC, BOOK_RECORD, OpeningBook
+from self_driving_team.tablebase import TABLEBASE_FILE, load_tablebase
+from self_driving_team.batch_eval import HAVE_NUMPY, encode_boards
+from self_driving_team.batch_rollout import WHITE, BLACK, random_playouts
+from self_driving_team.referee import is_valid_action
+from self_driving_team.bench import CORPUS
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+"""
+consistency checks for changes to the board and the search, each one
+compares a fast path against the simple one it has to agree with:
+
+    make/unmake -- every move made and taken back restores the board, and
+                   the incremental state after it matches a rebuilt board
+    legality    -- the board generates the moves util.all_moves does, and
+                   the referee accepts those and nothing else
+    book        -- every move survives encode_move/decode_move, and a book
+                   written for the positions gives their moves back
+    pvs         -- principal variation search plays the same move with the
+                   same score as plain alpha beta at equal depth
+    quiescence  -- the same with quiescence on, and quiesce with a narrow
+                   window returns a right bound on its full window score,
+                   on endgames too where booms end the game
+    batch       -- batched last ply scoring plays the same move with the
+                   same score as scoring the leaves one at a time
+    rollouts    -- a ply of the batched random playouts only reaches boards
+                   a legal move reaches
+    parallel    -- the root parallel search plays the same move with the
+                   same score as the serial search
+    tablebase   -- root parallel and batched search against serial with the
+                   tablebase, on endgames a few tokens bigger than it covers
+
+batch and rollouts need numpy, tablebase a tablebase file, they are skipped
+without. the Lazy SMP and pondering searches are left out, what they play
+depends on how far their workers got. run them all (exits 1 when one fails)
+with
+
+    python -m self_driving_team.consistency [--positions N] [--workers W] [--tablebase PATH]
+"""
+
+# random playouts of one ply checked per position
+ROLLOUT_SAMPLES = 64
+
+# tokens on the endgames checked when there is no tablebase, with one they
+# get two more than it covers
+ENDGAME_TOKENS = 5
+
+"""
+the corpus positions plus positions from random games, as (board, colour to
+move), all with both colours still on the board
+"""
+def positions(count, seed=0):
+    rng = random.Random(seed)
+    found = [(Board.from_dict(board_dict), colour) for name, board_dict, colour in CORPUS]
+    while len(found) < count:
+        board = Board.from_dict(init_board())
+        colour = "white"
+        for ply in range(rng.randrange(2, 40)):
+            board.make_move(rng.choice(board.all_moves(colour)))
+            colour = colour_switch(colour)
+            if not board.num_white or not board.num_black:
+                break
+        if board.num_white and board.num_black:
+            found.append((board, colour))
+    return found[:count]
+
+"""
+random endgames with tokens tokens in all, each colour having at least one,
+as (board, colour to move)
+"""
+def endgame_positions(count, tokens, seed=0):
+    rng = random.Random(seed)
+    found = []
+    while len(found) < count:
+        white = rng.randint(1, tokens-1)
+        stacks = {}
+        for piece in "W"*white + "B"*(tokens-white):
+            # onto an empty square or a stack of the same colour
+            pos = rng.choice([pos for pos in POSITIONS if stacks.get(pos, (piece, 0))[0] == piece])
+            stacks[pos] = (piece, stacks.get(pos, (piece, 0))[1] + 1)
+        board = Board.from_dict({pos: "%s %d" % stack for pos, stack in stacks.items()})
+        found.append((board, rng.choice(["white", "black"])))
+    return found
+
+"""
+the evaluation state of a board, what make_move keeps up to date
+"""
+def board_state(board):
+    return (board.white, board.black, board.heights, board.num_white, board.num_black,
+            board.hash, board.white_stacks, board.black_stacks)
+
+def check_make_unmake(board, colour):
+    failures = []
+    before = board_state(board)
+    for move in board.all_moves(colour):
+        undo = board.make_move(move)
+        rebuilt = Board.from_dict(board.to_dict())
+        if board_state(board) != board_state(rebuilt):
+            failures.append("%r leaves the board state out of step with a rebuilt board" % (move,))
+        board.unmake_move(undo)
+        if board_state(board) != before:
+            failures.append("%r is not undone by unmake_move" % (move,))
+    return failures
+
+def check_legality(board, colour):
+    failures = []
+    moves = set(board.all_moves(colour))
+    expected = set(all_moves(board.to_dict(), colour))
+    if moves != expected:
+        failures.append("all_moves has %d moves util.all_moves has not, and misses %d" % (
+            len(moves - expected), len(expected - moves)))
+
+    # a boom on every square, and moves of every size up to one more than
+    # the stack from each own stack to every square and the ring off the board
+    candidates = [("BOOM", pos) for pos in POSITIONS]
+    targets = [(x, y) for x in range(-1, BOARD_SIZE+1) for y in range(-1, BOARD_SIZE+1)]
+    for sq in iter_squares(board.occupancy(colour)):
+        for n in range(1, board.heights[sq]+2):
+            candidates.extend(("MOVE", n, POSITIONS[sq], pos) for pos in targets)
+    for move in candidates:
+        if is_valid_action(board, move, colour) != (move in expected):
+            failures.append("the referee %s %r" % ("rejects" if move in expected else "accepts", move))
+    return failures
+
+"""
+the book check over all the positions at once, as it writes one book for them
+"""
+def check_book(found):
+    failures = []
+    book_moves = {}
+    for board, colour in found:
+        moves = board.all_moves(colour)
+        for move in moves:
+            if decode_move(encode_move(move)) != move:
+                failures.append("%r comes back from encode_move as %r" % (move, decode_move(encode_move(move))))
+        book_moves[board.key(colour)] = moves[len(moves)//2]
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "check.book")
+        write_table(path, BOOK_MAGIC, BOOK_RECORD,
+                    [(key, encode_move(move), 0) for key, move in book_moves.items()])
+        book = OpeningBook(path)
+        try:
+            for i, (board, colour) in enumerate(found):
+                move = book.probe(board, colour)
+                if move != book_moves[board.key(colour)]:
+                    failures.append("position %d: the book gives %r for %r" % (
+                        i, move, book_moves[board.key(colour)]))
+        finally:
+            book.close()
+    return failures
+
+def make_search(pvs, evaluator=leaf_eval, **options):
+    return Search(evaluator, tt=TranspositionTable(), orderer=MoveOrderer(), pvs=pvs, **options)
+
+def check_pvs(board, colour, depth, **options):
+    plain = make_search(False, **options)
+    pvs = make_search(True, **options)
+    move = plain.choose_move(board.copy(), colour, depth)
+    pvs_move = pvs.choose_move(board.copy(), colour, depth)
+    if (move, plain.last_score) != (pvs_move, pvs.last_score):
+        return ["pvs plays %r (%s), alpha beta %r (%s)" % (pvs_move, pvs.last_score, move, plain.last_score)]
+    return []
+
+def check_quiescence(board, colour, depth, tablebase=None):
+    failures = check_pvs(board, colour, depth, quiescence=True, tablebase=tablebase)
+
+    # below alpha the score is an upper bound, above beta a lower one
+    search = make_search(False, quiescence=True, tablebase=tablebase)
+    search.root_colour = colour
+    exact = search.quiesce(board, colour, -INFINITY, INFINITY, QS_DEPTH)
+    for alpha, beta in ((exact-1, exact-1+PVS_EPSILON), (exact-PVS_EPSILON, exact),
+                        (exact, exact+PVS_EPSILON), (exact+0.5, exact+1), (exact-2, exact+2)):
+        score = search.quiesce(board, colour, alpha, beta, QS_DEPTH)
+        if score <= alpha:
+            right = exact <= score
+        elif score >= beta:
+            right = exact >= score
+        else:
+            right = score == exact
+        if not right:
+            failures.append("quiesce in (%s, %s) gives %s, with a full window %s" % (alpha, beta, score, exact))
+    return failures
+
+def check_batch(board, colour, depth, tablebase=None):
+    scalar = make_search(True, tablebase=tablebase)
+    batch = make_search(True, tablebase=tablebase, batch_leaves=True)
+    move = scalar.choose_move(board.copy(), colour, depth)
+    batch_move = batch.choose_move(board.copy(), colour, depth)
+    if (move, scalar.last_score) != (batch_move, batch.last_score):
+        return ["batched leaves play %r (%s), scalar %r (%s)" % (
+            batch_move, batch.last_score, move, scalar.last_score)]
+    return []
+
+def check_rollouts(board, colour, rng):
+    children = set()
+    for move in board.all_moves(colour):
+        child = board.copy()
+        child.make_move(move)
+        children.add(encode_boards([(child.white, child.black, child.heights)])[0].tobytes())
+
+    planes = np.repeat(encode_boards([(board.white, board.black, board.heights)]), ROLLOUT_SAMPLES, axis=0)
+    random_playouts(planes, np.full(ROLLOUT_SAMPLES, WHITE if colour == "white" else BLACK), 1, rng)
+    illegal = sum(1 for child in planes if child.tobytes() not in children)
+    if illegal:
+        return ["%d of %d playouts reach a board no legal move does" % (illegal, ROLLOUT_SAMPLES)]
+    return []
+
+def check_parallel(board, colour, depth, parallel, tablebase=None):
+    # ties go to the first move in the root order, which the history of
+    # earlier positions would change, so both start fresh (the pool is kept)
+    parallel.search = make_search(True, tablebase=tablebase)
+    serial = make_search(True, tablebase=tablebase)
+    move = serial.choose_move(board.copy(), colour, depth)
+    parallel_move = parallel.choose_move(board.copy(), colour, depth)
+    if (move, serial.last_score) != (parallel_move, parallel.last_score):
+        return ["root parallel plays %r (%s), serial %r (%s)" % (
+            parallel_move, parallel.last_score, move, serial.last_score)]
+    return []
+
+"""
+runs every check on count positions, returns {check: [failure messages]}.
+the checks that can not run here are left out
+"""
+def run_checks(count=30, depth=3, workers=2, seed=0, tablebase=None):
+    found = positions(count, seed)
+    failures = {"make/unmake": [], "legality": [], "book": check_book(found), "pvs": [], "quiescence": []}
+    if HAVE_NUMPY:
+        failures["batch"] = []
+        failures["rollouts"] = []
+        rng = np.random.default_rng(seed)
+    failures["parallel"] = []
+
+    parallel = RootParallelSearch(make_search(True), workers)
+    try:
+        for i, (board, colour) in enumerate(found):
+            where = "position %d (%s to move): " % (i, colour)
+            checks = [("make/unmake", check_make_unmake(board, colour)),
+                      ("legality", check_legality(board, colour)),
+                      ("pvs", check_pvs(board, colour, depth)),
+                      ("quiescence", check_quiescence(board, colour, depth))]
+            if HAVE_NUMPY:
+                checks.append(("batch", check_batch(board, colour, depth)))
+                checks.append(("rollouts", check_rollouts(board, colour, rng)))
+            checks.append(("parallel", check_parallel(board, colour, depth, parallel)))
+            for name, found_failures in checks:
+                failures[name].extend(where + failure for failure in found_failures)
+    finally:
+        parallel.close()
+
+    if tablebase is None:
+        for i, (board, colour) in enumerate(endgame_positions(count, ENDGAME_TOKENS, seed)):
+            where = "endgame %d (%s to move): " % (i, colour)
+            failures["quiescence"].extend(where + failure for failure in check_quiescence(board, colour, depth))
+        return failures
+
+    failures["tablebase"] = []
+    # the workers build their search once, so the table goes in from the start
+    parallel = RootParallelSearch(make_search(True, tablebase=tablebase), workers)
+    try:
+        for i, (board, colour) in enumerate(endgame_positions(count, tablebase.max_tokens + 2, seed)):
+            where = "endgame %d (%s to move): " % (i, colour)
+            failures["quiescence"].extend(where + failure for failure in check_quiescence(board, colour, depth, tablebase))
+            found_failures = check_parallel(board, colour, depth, parallel, tablebase)
+            if HAVE_NUMPY:
+                found_failures += check_batch(board, colour, depth, tablebase)
+            failures["tablebase"].extend(where + failure for failure in found_failures)
+    finally:
+        parallel.close()
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="check the fast board and search paths against the simple ones")
+    parser.add_argument("--positions", type=int, default=30)
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=2, help="processes for the root parallel search")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tablebase", default=TABLEBASE_FILE, help="tablebase file for the tablebase check")
+    args = parser.parse_args(argv)
+
+    tablebase = load_tablebase(args.tablebase)
+    failures = run_checks(args.positions, args.depth, args.workers, args.seed, tablebase)
+    for name, found in failures.items():
+        print("%-12s %s" % (name, "ok" if not found else "%d failed" % len(found)))
+        for failure in found:
+            print("    " + failure)
+    if any(failures.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
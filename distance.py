@@ -0,0 +1,75 @@
+from self_driving_team.util import *
+from self_driving_team.bitboard import *
+
+"""
+manhattan distance transforms of the 8x8 board for richer heuristics, the
+shortest distance between two masks that eval_zero needs is in bitboard.py
+"""
+
+# MANHATTAN[i][j] is the manhattan distance between squares i and j
+MANHATTAN = [[manhattan_distance(POSITIONS[i], POSITIONS[j]) for j in range(NUM_SQUARES)]
+             for i in range(NUM_SQUARES)]
+
+"""
+distance from every square to the nearest square of mask, a list of 64 ints
+(NO_DISTANCE everywhere for an empty mask), two sweeps over the board
+"""
+def distance_transform(mask):
+    inf = NO_DISTANCE
+    dist = [0 if mask >> sq & 1 else inf for sq in range(NUM_SQUARES)]
+
+    # forward sweep, from the squares below and to the left
+    for sq in range(NUM_SQUARES):
+        x = sq % BOARD_SIZE
+        if x > 0 and dist[sq-1] + 1 < dist[sq]:
+            dist[sq] = dist[sq-1] + 1
+        if sq >= BOARD_SIZE and dist[sq-BOARD_SIZE] + 1 < dist[sq]:
+            dist[sq] = dist[sq-BOARD_SIZE] + 1
+
+    # backward sweep, from the squares above and to the right
+    for sq in range(NUM_SQUARES-1, -1, -1):
+        x = sq % BOARD_SIZE
+        if x < BOARD_SIZE-1 and dist[sq+1] + 1 < dist[sq]:
+            dist[sq] = dist[sq+1] + 1
+        if sq < NUM_SQUARES-BOARD_SIZE and dist[sq+BOARD_SIZE] + 1 < dist[sq]:
+            dist[sq] = dist[sq+BOARD_SIZE] + 1
+
+    return dist
+
+
+class DistanceMap:
+    """
+    Distance from every square to the nearest token of one colour.
+
+    Adding a token only lowers distances, so add() updates the map in O(64).
+    Removing one can raise distances anywhere, so remove() redoes the
+    transform.
+    """
+
+    def __init__(self, mask=0):
+        self.mask = mask
+        self.dist = distance_transform(mask)
+
+    def add(self, sq):
+        self.mask |= 1 << sq
+        dist = self.dist
+        for i, d in enumerate(MANHATTAN[sq]):
+            if d < dist[i]:
+                dist[i] = d
+
+    def remove(self, sq):
+        self.mask &= ~(1 << sq)
+        self.dist = distance_transform(self.mask)
+
+    def nearest(self, mask):
+        """Shortest distance from any square of mask to this colour."""
+        return min((self.dist[sq] for sq in iter_squares(mask)), default=NO_DISTANCE)
+
+"""
+per token distance maps: {square: distance to the nearest enemy token} for
+every stack of colour
+"""
+def token_distances(board, colour):
+    enemy = board.black if colour == "white" else board.white
+    dist = distance_transform(enemy)
+    return {sq: dist[sq] for sq in iter_squares(board.occupancy(colour))}
@@ -0,0 +1,27 @@
+import sys
+import argparse
+from self_driving_team.book import *
+
+"""
+command line tool that searches the first plies of the game and writes the
+opening book the players load, see book.py
+"""
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="build the opening book")
+    parser.add_argument("--plies", type=int, default=2, help="plies from the start to cover")
+    parser.add_argument("--depth", type=int, default=4, help="search depth for each position")
+    parser.add_argument("--output", default=BOOK_FILE, help="book file to write")
+    args = parser.parse_args(argv)
+
+    def progress(done, total):
+        if done % 100 == 0 or done == total:
+            print("\r%d / %d positions" % (done, total), end="", file=sys.stderr)
+
+    count = build_book(args.output, args.plies, args.depth, progress=progress)
+    print("\nwrote %d positions to %s" % (count, args.output), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
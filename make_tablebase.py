@@ -0,0 +1,25 @@
+import sys
+import argparse
+from self_driving_team.tablebase import *
+
+"""
+command line tool that solves the small endgames and writes the tablebase the
+players load, see tablebase.py
+"""
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="build the endgame tablebase")
+    parser.add_argument("--tokens", type=int, default=3, help="most tokens left on the board")
+    parser.add_argument("--output", default=TABLEBASE_FILE, help="tablebase file to write")
+    args = parser.parse_args(argv)
+
+    def progress(plies, solved, unsolved):
+        print("\rpass %d: %d solved, %d left" % (plies, solved, unsolved), end="", file=sys.stderr)
+
+    count = build_tablebase(args.output, args.tokens, progress=progress)
+    print("\nwrote %d won or lost positions to %s" % (count, args.output), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
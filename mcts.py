@@ -0,0 +1,332 @@
+import os
+import math
+import time
+import random
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from self_driving_team.util import *
+from self_driving_team.bitboard import *
+from self_driving_team.clock import *
+from self_driving_team.parallel import shut_down_with
+
+"""
+monte carlo tree search, an alternative to the alpha beta search: UCT over
+the same all_moves/make_move board, with cheap random rollouts to score the
+leaves
+
+rollouts never build a move list: each ply plays the best material winning
+BOOM there is, otherwise a random MOVE of a random stack straight from the
+board's cached per stack moves, made and unmade on the one board
+"""
+
+# uct exploration constant, sqrt(2) for rewards in 0-1
+UCT_C = 1.4
+
+# plies a rollout plays before the board is scored on material
+ROLLOUT_PLIES = 40
+
+# visits a selection adds to the nodes on its path until its rollout is
+# backed up, so the other leaves of a batch go elsewhere
+VIRTUAL_LOSS = 1
+
+# leaves each worker rolls out per batch
+LEAVES_PER_WORKER = 8
+
+"""
+score of a finished or cut off rollout for white, 1 a win, 0 a loss and in
+between by material for unfinished games
+"""
+def white_result(board):
+    if not board.num_black:
+        return 1.0 if board.num_white else 0.5
+    if not board.num_white:
+        return 0.0
+    return 0.5 + (board.num_white - board.num_black) / (2*MAX_STACK)
+
+"""
+the BOOM gaining colour the most tokens (enemy tokens removed less its own),
+None when none gains any. only stacks next to an enemy stack are tried, and
+one per connected group
+"""
+def greedy_boom(board, colour):
+    own = board.occupancy(colour)
+    enemy = board.black if colour == "white" else board.white
+    best_sq = None
+    best_gain = 0
+    tried = 0
+    for sq in iter_squares(own & dilate(enemy)):
+        if tried >> sq & 1:
+            continue
+        region, white_removed, black_removed = board.blast(sq)
+        tried |= region
+        gain = black_removed - white_removed if colour == "white" else white_removed - black_removed
+        if gain > best_gain:
+            best_sq = sq
+            best_gain = gain
+    return best_sq
+
+"""
+a random MOVE for colour, picked from a random stack's cached moves, a BOOM
+when the stack picked can not move
+"""
+def random_move(board, colour, rng):
+    own = board.occupancy(colour)
+    enemy = board.black if colour == "white" else board.white
+
+    # the k-th stack, counted from the lowest square
+    k = rng.randrange(bin(own).count("1"))
+    for i in range(k):
+        own &= own - 1
+    sq = (own & -own).bit_length() - 1
+
+    moves = board.avail_moves(sq, enemy)
+    if len(moves) == 1:
+        return moves[0]
+    return moves[rng.randrange(1, len(moves))]
+
+"""
+plays a rollout from board with colour to move and returns its white_result,
+the board is left as it was
+"""
+def rollout(board, colour, rng, plies=ROLLOUT_PLIES):
+    undos = []
+    for ply in range(plies):
+        if not board.num_white or not board.num_black:
+            break
+        sq = greedy_boom(board, colour)
+        if sq is not None:
+            move = ("BOOM", POSITIONS[sq])
+        else:
+            move = random_move(board, colour, rng)
+        undos.append(board.make_move(move))
+        colour = colour_switch(colour)
+
+    result = white_result(board)
+    for undo in reversed(undos):
+        board.unmake_move(undo)
+    return result
+
+"""
+rolls out a batch of leaves in a worker process, jobs being (board, colour)
+"""
+def _rollout_batch(jobs, seed):
+    rng = random.Random(seed)
+    return [rollout(board, colour, rng) for board, colour in jobs]
+
+
+class Node:
+    """
+    A position in the tree, colour to move. wins is the total reward of the
+    rollouts through it for the player who moved into it, untried the moves
+    not expanded yet (None until the node is first selected).
+    """
+    __slots__ = ("move", "parent", "colour", "children", "untried", "visits", "wins")
+
+    def __init__(self, move, parent, colour):
+        self.move = move
+        self.parent = parent
+        self.colour = colour
+        self.children = []
+        self.untried = None
+        self.visits = 0
+        self.wins = 0.0
+
+    def select_child(self, c):
+        """The child with the best UCT score."""
+        log_visits = math.log(self.visits)
+        best = None
+        best_score = -1.0
+        for child in self.children:
+            score = child.wins/child.visits + c*math.sqrt(log_visits/child.visits)
+            if score > best_score:
+                best = child
+                best_score = score
+        return best
+
+
+class MCTS:
+    """
+    UCT search with the same choose_move(board, colour, max_depth) interface
+    as Search, max_depth is ignored.
+
+    It is anytime: it runs batches of rollouts until the time control's
+    deadline (GameClock) or, without one, for iterations rollouts, and plays
+    the most visited move. The tree is kept between moves, advance() moves
+    the root down to the child for each move played.
+
+    Each batch selects several leaves, adding VIRTUAL_LOSS visits along each
+    path so the selections spread out, then rolls them all out, on workers
+    processes when there are more than one, before backing the results up.
+    With one worker, or where the pool can not be made, the rollouts run in
+    this process. The pool is kept for the game, until close() or the search
+    is garbage collected.
+
+    Attributes
+    nodes -- rollouts of the last choose_move
+    last_score -- expected reward of the move played, 0-1
+    last_depth -- deepest leaf of the last choose_move
+    """
+
+    def __init__(self, time_control=None, iterations=1000, c=UCT_C, workers=1,
+                 rollout_plies=ROLLOUT_PLIES, seed=None):
+        self.time_control = time_control if time_control is not None else NoTimeLimit()
+        self.iterations = iterations
+        self.c = c
+        self.workers = workers if workers is not None else os.cpu_count() or 1
+        self.rollout_plies = rollout_plies
+        self.rng = random.Random(seed)
+        self.pool = None
+        self.serial = self.workers < 2
+
+        self.root = None
+        self.root_key = None
+
+        self.nodes = 0
+        self.last_score = None
+        self.last_depth = 0
+
+    def start_pool(self):
+        try:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        except (OSError, ImportError, NotImplementedError):
+            return False
+        self.shut_down = shut_down_with(self, self.pool)
+        return True
+
+    def close(self):
+        if self.pool is not None:
+            self.shut_down()
+            self.pool = None
+
+    def advance(self, move):
+        """Keeps the subtree of a move played, drops the tree if it was not expanded."""
+        if self.root is None:
+            return
+        for child in self.root.children:
+            if child.move == move:
+                child.parent = None
+                self.root = child
+                self.root_key = None
+                return
+        self.root = None
+
+    def choose_move(self, board, colour, max_depth=None):
+        """Searches the position with colour to move and returns the move to play."""
+        if not self.serial and self.pool is None and not self.start_pool():
+            self.serial = True
+
+        # a tree kept from the last move must be for this position
+        key = board.key(colour)
+        if self.root is None or self.root_key not in (None, key) or self.root.colour != colour:
+            self.root = Node(None, None, colour)
+        self.root_key = key
+
+        self.nodes = 0
+        self.last_depth = 0
+        board = board.copy()
+        deadline = self.time_control.start()
+        try:
+            while True:
+                if deadline is None:
+                    if self.nodes >= self.iterations:
+                        break
+                elif time.perf_counter() >= deadline and self.nodes:
+                    break
+                self.run_batch(board)
+        finally:
+            self.time_control.stop()
+
+        if not self.root.children:
+            moves = board.all_moves(colour)
+            return moves[0] if moves else ""
+        best = max(self.root.children, key=lambda child: child.visits)
+        self.last_score = best.wins / best.visits
+        return best.move
+
+    def run_batch(self, board):
+        """Selects a batch of leaves, rolls them out and backs up the results."""
+        size = 1 if self.serial else self.workers*LEAVES_PER_WORKER
+        leaves = []
+        jobs = []
+        for i in range(size):
+            leaf, undos = self.select(board)
+            leaves.append(leaf)
+            if self.serial:
+                jobs.append(rollout(board, leaf.colour, self.rng, self.rollout_plies))
+            else:
+                jobs.append((board.copy(), leaf.colour))
+            for undo in reversed(undos):
+                board.unmake_move(undo)
+
+        if self.serial:
+            results = jobs
+        else:
+            try:
+                results = self.parallel_rollouts(jobs)
+            except (BrokenProcessPool, OSError):
+                self.close()
+                self.serial = True
+                results = [rollout(job_board, colour, self.rng, self.rollout_plies)
+                           for job_board, colour in jobs]
+
+        for leaf, result in zip(leaves, results):
+            self.backup(leaf, result)
+        self.nodes += len(leaves)
+
+    def parallel_rollouts(self, jobs):
+        chunks = [jobs[i::self.workers] for i in range(self.workers)]
+        futures = [self.pool.submit(_rollout_batch, chunk, self.rng.getrandbits(32))
+                   for chunk in chunks if chunk]
+        results = [None] * len(jobs)
+        for i, future in enumerate(futures):
+            results[i::self.workers] = future.result()
+        return results
+
+    def select(self, board):
+        """
+        Walks from the root to a leaf by UCT, expanding one untried move, and
+        returns (leaf, undos) with the leaf's moves made on board and their
+        virtual losses added.
+        """
+        node = self.root
+        undos = []
+        node.visits += VIRTUAL_LOSS
+        while True:
+            if node.untried is None:
+                if board.num_white and board.num_black:
+                    node.untried = board.all_moves(node.colour, unique_booms=True)
+                else:
+                    node.untried = []
+
+            # expand a random untried move
+            if node.untried:
+                move = node.untried.pop(self.rng.randrange(len(node.untried)))
+                undos.append(board.make_move(move))
+                child = Node(move, node, colour_switch(node.colour))
+                node.children.append(child)
+                child.visits += VIRTUAL_LOSS
+                node = child
+                break
+
+            # a finished game
+            if not node.children:
+                break
+
+            node = node.select_child(self.c)
+            undos.append(board.make_move(node.move))
+            node.visits += VIRTUAL_LOSS
+
+        self.last_depth = max(self.last_depth, len(undos))
+        return node, undos
+
+    def backup(self, leaf, white_reward):
+        """Takes the virtual losses back off the path and adds the real result."""
+        node = leaf
+        while node is not None:
+            node.visits += 1 - VIRTUAL_LOSS
+            if node.colour == "white":
+                # the move into this node was black's
+                node.wins += 1 - white_reward
+            else:
+                node.wins += white_reward
+            node = node.parent
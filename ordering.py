@@ -0,0 +1,175 @@
+import random
+from self_driving_team.bitboard import to_square
+
+"""
+move ordering for the alpha beta searches, the better the first moves the more
+of the rest alpha beta can prune
+"""
+
+# ordering stages, in the order moves are tried
+STAGE_BOOM = "boom"         # booms that win material, biggest gain first
+STAGE_TT = "tt"             # previous principal variation / transposition table move
+STAGE_KILLER = "killer"     # quiet moves that caused a cutoff at the same depth
+STAGE_HISTORY = "history"   # everything else, by history score
+STAGES = (STAGE_BOOM, STAGE_TT, STAGE_KILLER, STAGE_HISTORY)
+
+# killer moves kept per depth
+NUM_KILLERS = 2
+
+"""
+material won by a boom for colour, enemy tokens removed minus own tokens removed
+"""
+def boom_gain(board, move, colour):
+    region, white_removed, black_removed = board.blast(to_square(move[1]))
+    if colour == "white":
+        return black_removed - white_removed
+    return white_removed - black_removed
+
+
+class MoveOrderer:
+    """
+    Orders the moves of a node in stages: winning booms, the tt/pv move,
+    killer moves for the depth, then the rest by history score. Every stage
+    can be switched off, and each one counts the cutoffs its moves produce and
+    the moves those cutoffs pruned.
+
+    With a seed, moves the history does not tell apart are shuffled, so
+    parallel searchers of the same position each take their own path.
+    """
+
+    def __init__(self, booms=True, tt=True, killers=True, history=True, seed=None):
+        self.booms = booms
+        self.use_tt = tt
+        self.killers_on = killers
+        self.history_on = history
+        self.rng = random.Random(seed) if seed is not None else None
+
+        self.killers = {}
+        self.history = {}
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.nodes = 0
+        self.generated = 0
+        self.first_cutoffs = 0
+        self.lazy_cutoffs = 0
+        self.lazy_searched = 0
+        self.placed = dict.fromkeys(STAGES, 0)
+        self.cutoffs = dict.fromkeys(STAGES, 0)
+        self.pruned = dict.fromkeys(STAGES, 0)
+
+    def new_search(self):
+        """Forgets the killers and ages the history before a new search."""
+        self.killers = {}
+        for move in list(self.history):
+            self.history[move] //= 2
+            if not self.history[move]:
+                del self.history[move]
+
+    def first(self, move):
+        """Records a pv/tt move the search tried before generating the rest."""
+        self.placed[STAGE_TT] += 1
+
+    def order(self, board, moves, colour, depth, tt_move=None, pv_move=None):
+        """
+        Returns (moves, stages), the moves in the order to search them and the
+        stage that placed each one.
+        """
+        self.nodes += 1
+        self.generated += len(moves)
+
+        first = []
+        if self.use_tt:
+            for move in (pv_move, tt_move):
+                if move and move not in first and move in moves:
+                    first.append(move)
+
+        killers = self.killers.get(depth, ()) if self.killers_on else ()
+        history = self.history
+
+        gains = []
+        killer_moves = []
+        rest = []
+        for move in moves:
+            if move in first:
+                continue
+            if self.booms and move[0] == "BOOM":
+                gain = boom_gain(board, move, colour)
+                if gain > 0:
+                    gains.append((gain, move))
+                    continue
+            if move in killers:
+                killer_moves.append(move)
+            else:
+                rest.append(move)
+
+        gains.sort(key=lambda item: -item[0])
+        if self.rng is not None:
+            self.rng.shuffle(rest)
+        if self.history_on:
+            rest.sort(key=lambda move: -history.get(move, 0))
+
+        ordered = [move for gain, move in gains]
+        stages = [STAGE_BOOM] * len(ordered)
+        ordered.extend(first)
+        stages.extend([STAGE_TT] * len(first))
+        ordered.extend(killer_moves)
+        stages.extend([STAGE_KILLER] * len(killer_moves))
+        ordered.extend(rest)
+        stages.extend([STAGE_HISTORY] * len(rest))
+
+        for stage in stages:
+            self.placed[stage] += 1
+        return ordered, stages
+
+    def cutoff(self, move, stage, depth, index, num_moves):
+        """
+        Records that the index-th of num_moves moves caused a cutoff, num_moves
+        is None when the rest of the moves were never generated.
+        """
+        self.cutoffs[stage] += 1
+        if num_moves is None:
+            self.nodes += 1
+            self.lazy_cutoffs += 1
+            self.lazy_searched += index + 1
+        else:
+            self.pruned[stage] += num_moves - index - 1
+        if index == 0:
+            self.first_cutoffs += 1
+
+        # quiet moves become killers and gain history
+        if stage != STAGE_BOOM:
+            if self.killers_on:
+                killers = self.killers.setdefault(depth, [])
+                if move not in killers:
+                    killers.insert(0, move)
+                    del killers[NUM_KILLERS:]
+            if self.history_on:
+                self.history[move] = self.history.get(move, 0) + depth*depth
+
+    def report(self):
+        """
+        Ordering statistics: per stage the moves placed, cutoffs and pruning
+        ratio (moves pruned by its cutoffs over all moves generated), with the
+        overall share of cutoffs on the first move, the cutoffs found before
+        the moves were generated and the effective branching factor (moves
+        actually searched per node).
+        """
+        generated = max(self.generated, 1)
+        total_pruned = sum(self.pruned.values())
+        total_cutoffs = sum(self.cutoffs.values())
+        stages = {}
+        for stage in STAGES:
+            stages[stage] = {
+                "placed": self.placed[stage],
+                "cutoffs": self.cutoffs[stage],
+                "pruning_ratio": self.pruned[stage] / generated,
+            }
+        return {
+            "nodes": self.nodes,
+            "pruning_ratio": total_pruned / generated,
+            "first_move_cutoffs": self.first_cutoffs / max(total_cutoffs, 1),
+            "lazy_cutoffs": self.lazy_cutoffs,
+            "branching_factor": (self.generated - total_pruned + self.lazy_searched) / max(self.nodes, 1),
+            "stages": stages,
+        }
@@ -0,0 +1,474 @@
+import os
+import struct
+import weakref
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from self_driving_team.util import *
+from self_driving_team.bitboard import *
+from self_driving_team.transposition import *
+from self_driving_team.clock import *
+from self_driving_team.ordering import *
+from self_driving_team.search import *
+
+try:
+    from multiprocessing.shared_memory import SharedMemory
+except ImportError:
+    SharedMemory = None
+
+"""
+parallel searches over a pool of worker processes, each running a serial
+Search: RootParallelSearch shares the root moves out between the workers,
+LazySMPSearch has them all search the whole position through one
+transposition table in shared memory
+"""
+
+# slack taken off the bound for moves before the best one found so far, so
+# they never fail low on a tie (the serial search would pick them)
+EPSILON = 1e-9
+
+# state of a worker process, set up once by _init_worker and kept between turns
+_worker = {}
+
+"""
+runs once in each worker process, builds the search it keeps for the whole game
+"""
+def _init_worker(shared_best, options):
+    _worker["best"] = shared_best
+    _worker["search"] = Search(tt=TranspositionTable(), orderer=MoveOrderer(), **options)
+    _worker["turn"] = None
+
+"""
+searches the index-th root move in a worker, returns (score, alpha, nodes)
+where score is exact when it is above the alpha the move was searched with
+"""
+def _search_root_move(turn, board, colour, index, move, depth):
+    search = _worker["search"]
+    shared_best = _worker["best"]
+
+    # a new turn, start from empty tables so the result matches a fresh
+    # serial search
+    if turn != _worker["turn"]:
+        _worker["turn"] = turn
+        search.tt.clear()
+        search.orderer.new_search()
+    search.root_colour = colour
+    search.nodes = 0
+
+    # start from the best (score, index) any worker has found so far
+    with shared_best.get_lock():
+        alpha, best_index = shared_best[0], shared_best[1]
+    if best_index > index:
+        alpha -= EPSILON
+    board.make_move(move)
+    score = search.table_score(board, colour_switch(colour), 1)
+    if score is None:
+        score = search.negamax(board, colour_switch(colour), depth-1, -INFINITY, -alpha, ply=1)[0]
+    score = -score
+
+    # share a better score so the other workers cut off more
+    if score > alpha:
+        with shared_best.get_lock():
+            if score > shared_best[0] or score == shared_best[0] and index < shared_best[1]:
+                shared_best[0] = score
+                shared_best[1] = index
+
+    return score, alpha, search.nodes
+
+
+"""
+shuts pool down once owner is garbage collected, or at exit, for the pools of
+searches nobody closes. returns the finalizer, calling it shuts the pool down
+then and there
+"""
+def shut_down_with(owner, pool):
+    return weakref.finalize(owner, pool.shutdown)
+
+"""
+closes a shared memory block, unlinking it when this process made it. the
+finalizer of a SharedTranspositionTable, it holds no reference to the table
+"""
+def _release_block(shm, owner):
+    try:
+        shm.close()
+    except BufferError:
+        # a view of the block is still held, the mapping goes with the process
+        pass
+    if owner:
+        try:
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class RootParallelSearch:
+    """
+    Splits the root moves of a fixed depth search across worker processes.
+
+    The first root move is searched in this process, then the rest go to the
+    workers, which share the best root score found so far (and the index of
+    its move) in a multiprocessing.Array and start each move's search from
+    it, so they cut off like the serial search does. Ties go to the earliest
+    move in the serial root order, so it returns the move the serial search
+    would.
+
+    The pool is started on the first move and kept warm for the rest of the
+    game, until close() or the search is garbage collected. With fewer than two workers, a timed (iterative) search, or when
+    the pool cannot be started or breaks, the serial search is used instead.
+    """
+
+    def __init__(self, search, workers=None):
+        self.search = search
+        self.workers = workers if workers is not None else os.cpu_count() or 1
+        self.pool = None
+        self.shared_best = None
+        self.turn = 0
+
+        # the serial search can not hand its moves out, fall back for good
+        self.serial = self.workers < 2 or search.iterative
+
+        self.nodes = 0
+        self.last_score = None
+        self.last_depth = 0
+
+    def start_pool(self):
+        """Starts the worker processes, False if this platform can not."""
+        try:
+            self.shared_best = multiprocessing.Array("d", 2)
+            self.pool = ProcessPoolExecutor(
+                max_workers=self.workers, initializer=_init_worker,
+                initargs=(self.shared_best, self.search.options()))
+        except (OSError, ImportError, NotImplementedError):
+            self.pool = None
+            return False
+        self.shut_down = shut_down_with(self, self.pool)
+        return True
+
+    def close(self):
+        if self.pool is not None:
+            self.shut_down()
+            self.pool = None
+
+    def choose_move(self, board, colour, max_depth):
+        """Searches the position with colour to move and returns the move to play."""
+        if not self.serial and self.pool is None and not self.start_pool():
+            self.serial = True
+
+        if not self.serial and not self.search.cutoff(board, max_depth):
+            try:
+                return self.parallel_move(board, colour, max_depth)
+            except (BrokenProcessPool, OSError):
+                self.close()
+                self.serial = True
+
+        move = self.search.choose_move(board, colour, max_depth)
+        self.nodes = self.search.nodes
+        self.last_score = self.search.last_score
+        self.last_depth = self.search.last_depth
+        return move
+
+    def advance(self, move):
+        self.search.advance(move)
+
+    def parallel_move(self, board, colour, max_depth):
+        self.turn += 1
+        search = self.search
+        search.root_colour = colour
+
+        # same root order as the serial search
+        if search.orderer is not None:
+            search.orderer.new_search()
+        moves = [move for move, stage, num_moves in search.ordered_moves(board, colour, max_depth, None, None)]
+        if not moves:
+            return search.choose_move(board, colour, max_depth)
+
+        # the first move is searched here with a full window, its score gives
+        # the workers a bound to cut off against from the start
+        search.nodes = 1
+        if search.tt is not None:
+            search.tt.clear()
+        undo = board.make_move(moves[0])
+        best_score = search.table_score(board, colour_switch(colour), 1)
+        if best_score is None:
+            best_score = search.negamax(board, colour_switch(colour), max_depth-1, -INFINITY, INFINITY, ply=1)[0]
+        best_score = -best_score
+        board.unmake_move(undo)
+        best_move = moves[0]
+        self.shared_best[0] = best_score
+        self.shared_best[1] = 0
+
+        futures = [self.pool.submit(_search_root_move, self.turn, board, colour, i, moves[i], max_depth)
+                   for i in range(1, len(moves))]
+
+        self.nodes = search.nodes
+        for move, future in zip(moves[1:], futures):
+            score, alpha, nodes = future.result()
+            self.nodes += nodes
+
+            # a score at or below its alpha is only an upper bound, the move
+            # is no better than an earlier one
+            if score > alpha and score > best_score:
+                best_score, best_move = score, move
+
+        self.last_score = best_score
+        self.last_depth = max_depth
+        return best_move
+
+
+# a shared table entry: key ^ data ^ score bits, data, score bits. data packs
+# depth | flag << 8 | encoded move << 16 | USED, the xor check makes a half
+# written entry read as a miss instead of a wrong result
+SHARED_ENTRY = struct.Struct("<QQQ")
+SCORE = struct.Struct("<d")
+USED = 1 << 32
+
+
+class SharedTranspositionTable(TranspositionTable):
+    """
+    Transposition table in a multiprocessing.shared_memory block of fixed
+    size entries, so several processes probe and store into the same table
+    without locks.
+
+    Created without a name it makes a new block (and unlinks it on close),
+    with the name of an existing block it attaches to it. A table that is
+    never closed does the same when it is garbage collected, or at exit.
+    """
+
+    def __init__(self, max_bytes=16*1024*1024, name=None):
+        size = 1
+        while size*2*SHARED_ENTRY.size <= max_bytes:
+            size *= 2
+        self.size = size
+        self.mask = size - 1
+
+        self.generation = 0
+        self.owner = name is None
+        if self.owner:
+            self.shm = SharedMemory(create=True, size=size*SHARED_ENTRY.size)
+        else:
+            self.shm = SharedMemory(name=name)
+        self.name = self.shm.name
+        self.buf = self.shm.buf
+        self.release = weakref.finalize(self, _release_block, self.shm, self.owner)
+
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+
+    def clear(self):
+        self.buf[:] = bytes(len(self.buf))
+
+    def probe(self, key):
+        """Returns the entry stored for key, or None."""
+        self.probes += 1
+        check, data, score_bits = SHARED_ENTRY.unpack_from(self.buf, (key & self.mask)*SHARED_ENTRY.size)
+        if not data or check ^ data ^ score_bits != key:
+            return None
+        self.hits += 1
+        score = SCORE.unpack(score_bits.to_bytes(8, "little"))[0]
+        return (key, data & 0xFF, score, data >> 8 & 3, decode_move(data >> 16 & 0xFFFF))
+
+    def store(self, key, depth, score, flag, move, ply=0):
+        score = score_from_root(score, ply)
+        offset = (key & self.mask)*SHARED_ENTRY.size
+        check, data, score_bits = SHARED_ENTRY.unpack_from(self.buf, offset)
+        if data and check ^ data ^ score_bits != key and depth < data & 0xFF:
+            return
+        score_bits = int.from_bytes(SCORE.pack(score), "little")
+        data = depth | flag << 8 | encode_move(move) << 16 | USED
+        SHARED_ENTRY.pack_into(self.buf, offset, key ^ data ^ score_bits, data, score_bits)
+        self.stores += 1
+
+    def usage(self):
+        """Fraction of slots in use."""
+        words = self.buf.cast("Q")
+        used = sum(1 for data in words[1:3*self.size:3] if data)
+        words.release()
+        return used / self.size
+
+    def close(self):
+        self.release()
+
+
+"""
+raises the stop flag of a SharedTablePool's processes and shuts its pool
+down, so a search still running does not hold the shutdown up. the finalizer
+of the pool, it holds no reference to it
+"""
+def _stop_pool(pool, stop_flag):
+    stop_flag.value = 1
+    pool.shutdown()
+
+
+class SharedTablePool:
+    """
+    A SharedTranspositionTable, a stop flag and a pool of processes that
+    search into the table, for a search running alongside them in this
+    process (Lazy SMP helpers, the ponder worker).
+
+    start() makes them and points the search at the shared table, close()
+    stops the processes and puts the search's own table back. A pool that is
+    never closed is stopped when it is garbage collected, or at exit. Each
+    process runs
+    initializer(stop_flag, table_name, table_bytes, options, *initargs),
+    options being the search's options().
+    """
+
+    def __init__(self, search, workers, table_bytes, initializer, initargs=()):
+        self.search = search
+        self.workers = workers
+        self.table_bytes = table_bytes
+        self.initializer = initializer
+        self.initargs = initargs
+        self.pool = None
+        self.table = None
+        self.stop_flag = None
+        self.serial_tt = search.tt
+
+    def start(self):
+        """Makes the shared table and starts the processes, False if this platform can not."""
+        try:
+            self.table = SharedTranspositionTable(self.table_bytes)
+            self.stop_flag = multiprocessing.RawValue("b", 0)
+            self.pool = ProcessPoolExecutor(
+                max_workers=self.workers, initializer=self.initializer,
+                initargs=(self.stop_flag, self.table.name, self.table_bytes,
+                          self.search.options()) + tuple(self.initargs))
+        except (OSError, ImportError, NotImplementedError):
+            self.close()
+            return False
+        self.shut_down = weakref.finalize(self, _stop_pool, self.pool, self.stop_flag)
+        self.serial_tt = self.search.tt
+        self.search.tt = self.table
+        return True
+
+    def submit(self, fn, *args):
+        return self.pool.submit(fn, *args)
+
+    def close(self):
+        if self.pool is not None:
+            self.shut_down()
+            self.pool = None
+        if self.table is not None:
+            if self.search.tt is self.table:
+                self.search.tt = self.serial_tt
+            self.table.close()
+            self.table = None
+
+
+# state of a lazy smp helper process, set up once by _init_helper
+_helper = {}
+
+"""
+runs once in each helper process, attaches to the shared table and builds the
+search it keeps for the whole game
+"""
+def _init_helper(stop_flag, table_name, table_bytes, options):
+    tt = SharedTranspositionTable(table_bytes, name=table_name)
+    time_control = SharedDeadline(None, stop_flag)
+
+    # a differently seeded move order per helper, so they split the work
+    orderer = MoveOrderer(seed=os.getpid())
+    _helper["search"] = Search(time_control=time_control, tt=tt, orderer=orderer,
+                               iterative=True, **options)
+
+"""
+iterative deepening in a helper until the deadline or the stop flag, returns
+(depth, move, score, nodes) of its deepest finished iteration
+"""
+def _helper_search(board, colour, max_depth, deadline):
+    search = _helper["search"]
+    search.time_control.deadline = deadline
+    search.root_colour = colour
+    search.nodes = 0
+    search.orderer.new_search()
+    val, move, depth = search.iterative_deepening(board, colour, max_depth)
+    return depth, move, val, search.nodes
+
+
+class LazySMPSearch:
+    """
+    Lazy SMP: this process and workers-1 helper processes all search the
+    same position, sharing one SharedTranspositionTable.
+
+    The helpers deepen iteratively with their own shuffled move orders until
+    the main search finishes (or the move's deadline passes). Their results
+    in the shared table let the main search cut off and order moves sooner.
+    The move comes from whichever search finished the deepest iteration, the
+    main search winning ties.
+
+    The pool and the table are made on the first move and kept for the game,
+    with fewer than two workers or when either can not be made the plain
+    serial search is used.
+    """
+
+    def __init__(self, search, workers=None, table_bytes=16*1024*1024):
+        self.search = search
+        self.workers = workers if workers is not None else os.cpu_count() or 1
+        self.shared = SharedTablePool(search, self.workers-1, table_bytes, _init_helper)
+        self.serial = self.workers < 2 or SharedMemory is None
+
+        self.nodes = 0
+        self.last_score = None
+        self.last_depth = 0
+
+    def close(self):
+        self.shared.close()
+
+    def choose_move(self, board, colour, max_depth):
+        """Searches the position with colour to move and returns the move to play."""
+        if not self.serial and self.shared.pool is None and not self.shared.start():
+            self.serial = True
+
+        if not self.serial:
+            try:
+                return self.smp_move(board, colour, max_depth)
+            except (BrokenProcessPool, OSError):
+                self.close()
+                self.serial = True
+
+        move = self.search.choose_move(board, colour, max_depth)
+        self.nodes = self.search.nodes
+        self.last_score = self.search.last_score
+        self.last_depth = self.search.last_depth
+        return move
+
+    def advance(self, move):
+        self.search.advance(move)
+
+    def smp_move(self, board, colour, max_depth):
+        search = self.search
+        search.root_colour = colour
+        search.nodes = 0
+        shared = self.shared
+        shared.table.clear()
+        if search.orderer is not None:
+            search.orderer.new_search()
+        shared.stop_flag.value = 0
+
+        deadline = search.time_control.start()
+        try:
+            futures = [shared.submit(_helper_search, board, colour, max_depth, deadline)
+                       for i in range(self.workers-1)]
+            try:
+                if search.iterative:
+                    val, move, depth = search.iterative_deepening(board, colour, max_depth)
+                else:
+                    val, move = search.negamax(board, colour, max_depth, -INFINITY, INFINITY)
+                    depth = max_depth
+            finally:
+                # the helpers stop at their next node
+                shared.stop_flag.value = 1
+            results = [future.result() for future in futures]
+        finally:
+            search.time_control.stop()
+
+        self.nodes = search.nodes
+        for helper_depth, helper_move, helper_val, nodes in results:
+            self.nodes += nodes
+            if helper_depth > depth and helper_move:
+                val, move, depth = helper_val, helper_move, helper_depth
+
+        self.last_score = val
+        self.last_depth = depth
+        return move
@@ -1,8 +1,18 @@
 import random
-import time
 from self_driving_team.util import *
 from self_driving_team.minimax import *
 from self_driving_team.catapult import *
+from self_driving_team.bitboard import *
+from self_driving_team.transposition import *
+from self_driving_team.clock import *
+from self_driving_team.ordering import *
+from self_driving_team.search import *
+from self_driving_team.parallel import *
+from self_driving_team.book import BOOK_FILE, load_book
+from self_driving_team.tablebase import TABLEBASE_FILE, load_tablebase
+from self_driving_team.telemetry import InstrumentedSearch, sink_from_env
+from self_driving_team.ponder import PonderingSearch
+from self_driving_team.mcts import MCTS
 
 # player 1: greedy player, makes the best move at the movement
 class GreedyPlayer:
@@ -20,9 +30,7 @@ class GreedyPlayer:
 
         # initialising the board
         self.colour = colour
-        self.board_dict = init_board()
-        self.num_black = 12
-        self.num_white = 12
+        self.board = Board.from_dict(init_board())
 
     def action(self):
         """
@@ -34,10 +42,10 @@ class GreedyPlayer:
         represented based on the spec's instructions for representing actions.
         """
         # get all moves for our colour
-        moves = all_moves(self.board_dict,self.colour)
+        moves = self.board.all_moves(self.colour)
 
         # get the greediest move from the move
-        move = greedy_move(self.board_dict, moves, self.colour, self.num_black, self.num_white)
+        move = greedy_move(self.board, moves, self.colour)
 
         return move
 
@@ -62,7 +70,7 @@ class GreedyPlayer:
         """
 
         # update the board accordingly
-        self.board_dict, self.num_black, self.num_white = make_move(self.board_dict, action, self.num_black, self.num_white)
+        self.board.make_move(action)
 
 
 # player 2: random player, makes random move from all available moves
@@ -81,9 +89,7 @@ class RandomPlayer:
 
         # initialising the board
         self.colour = colour
-        self.board_dict = init_board()
-        self.num_black = 12
-        self.num_white = 12
+        self.board = Board.from_dict(init_board())
 
     def action(self):
         """
@@ -95,7 +101,7 @@ class RandomPlayer:
         represented based on the spec's instructions for representing actions.
         """
         # get all moves for our colour
-        moves = all_moves(self.board_dict, self.colour)
+        moves = self.board.all_moves(self.colour)
 
         # get a random move from those moves
         move = random.choice(moves)
@@ -123,134 +129,57 @@ class RandomPlayer:
         """
 
         # update the board accordingly
-        self.board_dict, self.num_black, self.num_white = make_move(self.board_dict, action, self.num_black, self.num_white)
+        self.board.make_move(action)
 
-# player 3: alpha beta pruning minimax
-class AlphaBetaPlayer:
-    def __init__(self, colour):
-        """
-        This method is called once at the beginning of the game to initialise
-        your player. You should use this opportunity to set up your own internal
-        representation of the game state, and any other information about the
-        game state you would like to maintain for the duration of the game.
-
-        The parameter colour will be a string representing the player your
-        program will play as (White or Black). The value will be one of the
-        strings "white" or "black" correspondingly.
-        """
+# base for the alpha beta players, each one is a configuration of the search
+# engine in search.py: a leaf evaluator, a depth and fixed depth or timed
+class SearchPlayer:
 
-        # initialising the board
-        self.colour = colour
-        self.board_dict = init_board()
-        self.num_black = 12
-        self.num_white = 12
+    # leaf evaluator, see minimax.py and catapult.py
+    evaluator = staticmethod(leaf_eval)
 
-    def action(self):
-        """
-        This method is called at the beginning of each of your turns to request
-        a choice of action from your program.
-
-        Based on the current state of the game, your player should select and
-        return an allowed action to play on this turn. The action must be
-        represented based on the spec's instructions for representing actions.
-        """
-        # perform alpha beta minimax adversarial search
-        max_depth = 3
-        alpha = -100000     # neg inf
-        beta = 100000   # pos inf
-        is_max_player = True
-
-        val, move = minimax(self.board_dict, self.num_black, self.num_white, self.colour, max_depth, alpha, beta, is_max_player, self.colour)
-
-        return move
-
-
-    def update(self, colour, action):
-        """
-        This method is called at the end of every turn (including your player’s
-        turns) to inform your player about the most recent action. You should
-        use this opportunity to maintain your internal representation of the
-        game state and any other information about the game you are storing.
-
-        The parameter colour will be a string representing the player whose turn
-        it is (White or Black). The value will be one of the strings "white" or
-        "black" correspondingly.
-
-        The parameter action is a representation of the most recent action
-        conforming to the spec's instructions for representing actions.
-
-        You may assume that action will always correspond to an allowed action
-        for the player colour (your method does not need to validate the action
-        against the game rules).
-        """
-
-        # update the board accordingly
-        self.board_dict, self.num_black, self.num_white = make_move(self.board_dict, action, self.num_black, self.num_white)
-
-# player 4: alpha beta pruning minimax where 0 evals are recalculated to move in the right direction
-class AlphaBetaNonZeroPlayer:
-    def __init__(self, colour):
-        """
-        This method is called once at the beginning of the game to initialise
-        your player. You should use this opportunity to set up your own internal
-        representation of the game state, and any other information about the
-        game state you would like to maintain for the duration of the game.
-
-        The parameter colour will be a string representing the player your
-        program will play as (White or Black). The value will be one of the
-        strings "white" or "black" correspondingly.
-        """
+    # search depth, for timed players the deepest iteration
+    max_depth = 3
 
-        # initialising the board
-        self.colour = colour
-        self.board_dict = init_board()
-        self.num_black = 12
-        self.num_white = 12
+    # True to deepen iteratively under the game clock instead of a fixed depth
+    timed = False
 
-    def action(self):
-        """
-        This method is called at the beginning of each of your turns to request
-        a choice of action from your program.
+    # True to score the last ply with one numpy batch per node (batch_eval.py)
+    batch_leaves = False
 
-        Based on the current state of the game, your player should select and
-        return an allowed action to play on this turn. The action must be
-        represented based on the spec's instructions for representing actions.
-        """
-        # perform alpha beta minimax adversarial search
-        max_depth = 3
-        alpha = -100000     # neg inf
-        beta = 100000   # pos inf
-        is_max_player = True
+    # True to keep searching winning booms past max_depth (see Search.quiesce)
+    quiescence = False
 
-        val, move = minimax_dist(self.board_dict, self.num_black, self.num_white, self.colour, max_depth, alpha, beta, is_max_player, self.colour)
+    # principal variation search, same moves as plain alpha beta in fewer nodes
+    pvs = True
 
-        return move
+    # timed players: half width of the aspiration window around the last
+    # iteration's score, None to search every iteration with a full window
+    aspiration = None
 
+    # worker processes for the parallel searches (parallel.py), 1 searches
+    # serially, None uses every core
+    workers = 1
 
-    def update(self, colour, action):
-        """
-        This method is called at the end of every turn (including your player’s
-        turns) to inform your player about the most recent action. You should
-        use this opportunity to maintain your internal representation of the
-        game state and any other information about the game you are storing.
+    # with several workers, True for lazy smp instead of root splitting
+    lazy_smp = False
 
-        The parameter colour will be a string representing the player whose turn
-        it is (White or Black). The value will be one of the strings "white" or
-        "black" correspondingly.
+    # timed serial players: True to search the expected reply on the
+    # opponent's time (ponder.py)
+    ponder = False
 
-        The parameter action is a representation of the most recent action
-        conforming to the spec's instructions for representing actions.
+    # opening book to play from while the game is in it (book.py), None for none
+    book_file = None
 
-        You may assume that action will always correspond to an allowed action
-        for the player colour (your method does not need to validate the action
-        against the game rules).
-        """
+    # endgame tablebase the search scores solved positions from (tablebase.py),
+    # None for none
+    tablebase_file = None
 
-        # update the board accordingly
-        self.board_dict, self.num_black, self.num_white = make_move(self.board_dict, action, self.num_black, self.num_white)
+    # sink for per move search telemetry (telemetry.py), None reads the
+    # EXPENDIBOTS_TELEMETRY environment variable and runs the plain search
+    # when that is not set either
+    telemetry = None
 
-# player 5: minimax alpha beta pruning and zero reevaluation and time constraint
-class AlphaBetaTimeDist:
     def __init__(self, colour):
         """
         This method is called once at the beginning of the game to initialise
@@ -265,9 +194,36 @@ class AlphaBetaTimeDist:
 
         # initialising the board
         self.colour = colour
-        self.board_dict = init_board()
-        self.num_black = 12
-        self.num_white = 12
+        self.board = Board.from_dict(init_board())
+
+        # the search engine for this configuration
+        self.search = self.make_search()
+
+        # mapped, not read, so a missing or large book costs nothing here
+        self.book = load_book(self.book_file)
+
+    def make_search(self):
+        options = dict(time_control=GameClock() if self.timed else NoTimeLimit(),
+                       tt=TranspositionTable(), orderer=MoveOrderer(), iterative=self.timed,
+                       batch_leaves=self.batch_leaves,
+                       tablebase=load_tablebase(self.tablebase_file),
+                       quiescence=self.quiescence, pvs=self.pvs,
+                       aspiration=self.aspiration)
+
+        # the instrumented search only when there is somewhere to send its data
+        sink = self.telemetry if self.telemetry is not None else sink_from_env()
+        if sink is not None:
+            search = InstrumentedSearch(self.evaluator, sink, **options)
+        else:
+            search = Search(self.evaluator, **options)
+
+        if self.workers != 1 and self.lazy_smp:
+            return LazySMPSearch(search, self.workers)
+        if self.workers != 1:
+            return RootParallelSearch(search, self.workers)
+        if self.ponder and self.timed:
+            return PonderingSearch(search)
+        return search
 
     def action(self):
         """
@@ -279,80 +235,14 @@ class AlphaBetaTimeDist:
         represented based on the spec's instructions for representing actions.
         """
 
-        # perform alpha beta minimax adversarial search
-        max_depth = 10
-        alpha = -100000    # neg inf
-        beta = 100000   # pos inf
-        is_max_player = True
-        start_time = time.perf_counter()
-
-        val, move = minimax_time_dist(self.board_dict, self.num_black, self.num_white, self.colour, max_depth, alpha, beta, is_max_player, self.colour, start_time)
-
-        return move
-
-
-    def update(self, colour, action):
-        """
-        This method is called at the end of every turn (including your player’s
-        turns) to inform your player about the most recent action. You should
-        use this opportunity to maintain your internal representation of the
-        game state and any other information about the game you are storing.
-
-        The parameter colour will be a string representing the player whose turn
-        it is (White or Black). The value will be one of the strings "white" or
-        "black" correspondingly.
-
-        The parameter action is a representation of the most recent action
-        conforming to the spec's instructions for representing actions.
-
-        You may assume that action will always correspond to an allowed action
-        for the player colour (your method does not need to validate the action
-        against the game rules).
-        """
-
-        # update the board accordingly
-        self.board_dict, self.num_black, self.num_white = make_move(self.board_dict, action, self.num_black, self.num_white)
-
-# player 6: minimax alpha beta pruning and time constraint
-class AlphaBetaTime:
-    def __init__(self, colour):
-        """
-        This method is called once at the beginning of the game to initialise
-        your player. You should use this opportunity to set up your own internal
-        representation of the game state, and any other information about the
-        game state you would like to maintain for the duration of the game.
-
-        The parameter colour will be a string representing the player your
-        program will play as (White or Black). The value will be one of the
-        strings "white" or "black" correspondingly.
-        """
-
-        # initialising the board
-        self.colour = colour
-        self.board_dict = init_board()
-        self.num_black = 12
-        self.num_white = 12
-
-    def action(self):
-        """
-        This method is called at the beginning of each of your turns to request
-        a choice of action from your program.
-
-        Based on the current state of the game, your player should select and
-        return an allowed action to play on this turn. The action must be
-        represented based on the spec's instructions for representing actions.
-        """
+        # play from the opening book while the game is in it
+        if self.book is not None:
+            move = self.book.probe(self.board, self.colour)
+            if move:
+                return move
 
         # perform alpha beta minimax adversarial search
-        max_depth = 10
-        alpha = -100000    # neg inf
-        beta = 100000   # pos inf
-        is_max_player = True
-        start_time = time.perf_counter()
-
-        val, move = minimax_time(self.board_dict, self.num_black, self.num_white, self.colour, max_depth, alpha, beta, is_max_player, self.colour, start_time)
-
-        return move
+        return self.search.choose_move(self.board, self.colour, self.max_depth)
 
 
     def update(self, colour, action):
@@ -375,128 +265,66 @@ class AlphaBetaTime:
         """
 
         # update the board accordingly
-        self.board_dict, self.num_black, self.num_white = make_move(self.board_dict, action, self.num_black, self.num_white)
+        self.board.make_move(action)
 
-# player 7: Based on the Catapult trick discussed in our report
-class CatapultPlayer:
-    def __init__(self, colour):
-        """
-        This method is called once at the beginning of the game to initialise
-        your player. You should use this opportunity to set up your own internal
-        representation of the game state, and any other information about the
-        game state you would like to maintain for the duration of the game.
+        # keep what the search predicted for the rest of the game
+        self.search.advance(action)
 
-        The parameter colour will be a string representing the player your
-        program will play as (White or Black). The value will be one of the
-        strings "white" or "black" correspondingly.
+    def close(self):
         """
-
-        # initialising the board
-        self.colour = colour
-        self.board_dict = init_board()
-        self.num_black = 12
-        self.num_white = 12
-
-    def action(self):
-        """
-        This method is called at the beginning of each of your turns to request
-        a choice of action from your program.
-
-        Based on the current state of the game, your player should select and
-        return an allowed action to play on this turn. The action must be
-        represented based on the spec's instructions for representing actions.
+        Shuts down the search's worker processes and frees its shared memory,
+        at the end of the game. Searches with neither have no close().
         """
+        close = getattr(self.search, "close", None)
+        if close is not None:
+            close()
 
-        # perform alpha beta minimax adversarial search
-        max_depth = 3
-        alpha = -100000    # neg inf
-        beta = 100000   # pos inf
-        is_max_player = True
-
-        val, move = minimax_catapult(self.board_dict, self.num_black, self.num_white, self.colour, max_depth, alpha, beta, is_max_player, self.colour)
-        return move
-
-
-    def update(self, colour, action):
-        """
-        This method is called at the end of every turn (including your player’s
-        turns) to inform your player about the most recent action. You should
-        use this opportunity to maintain your internal representation of the
-        game state and any other information about the game you are storing.
+# player 3: alpha beta pruning minimax
+class AlphaBetaPlayer(SearchPlayer):
+    evaluator = staticmethod(leaf_eval)
+    max_depth = 3
 
-        The parameter colour will be a string representing the player whose turn
-        it is (White or Black). The value will be one of the strings "white" or
-        "black" correspondingly.
+# player 4: alpha beta pruning minimax where 0 evals are recalculated to move in the right direction
+class AlphaBetaNonZeroPlayer(SearchPlayer):
+    evaluator = staticmethod(leaf_eval_dist)
+    max_depth = 3
 
-        The parameter action is a representation of the most recent action
-        conforming to the spec's instructions for representing actions.
+# player 5: minimax alpha beta pruning and zero reevaluation and time constraint
+class AlphaBetaTimeDist(SearchPlayer):
+    evaluator = staticmethod(leaf_eval_dist)
+    max_depth = MAX_DEPTH
+    timed = True
 
-        You may assume that action will always correspond to an allowed action
-        for the player colour (your method does not need to validate the action
-        against the game rules).
-        """
+# player 6: minimax alpha beta pruning and time constraint
+class AlphaBetaTime(SearchPlayer):
+    evaluator = staticmethod(leaf_eval)
+    max_depth = MAX_DEPTH
+    timed = True
 
-        # update the board accordingly
-        self.board_dict, self.num_black, self.num_white = make_move(self.board_dict, action, self.num_black, self.num_white)
+# player 7: Based on the Catapult trick discussed in our report
+class CatapultPlayer(SearchPlayer):
+    evaluator = staticmethod(leaf_eval_catapult)
+    max_depth = 3
 
 # player 7: Based on the Catapult trick discussed in our report and Zero reevaluation
-class CatapultNonZeroPlayer:
-    def __init__(self, colour):
-        """
-        This method is called once at the beginning of the game to initialise
-        your player. You should use this opportunity to set up your own internal
-        representation of the game state, and any other information about the
-        game state you would like to maintain for the duration of the game.
-
-        The parameter colour will be a string representing the player your
-        program will play as (White or Black). The value will be one of the
-        strings "white" or "black" correspondingly.
-        """
-
-        # initialising the board
-        self.colour = colour
-        self.board_dict = init_board()
-        self.num_black = 12
-        self.num_white = 12
-
-    def action(self):
-        """
-        This method is called at the beginning of each of your turns to request
-        a choice of action from your program.
-
-        Based on the current state of the game, your player should select and
-        return an allowed action to play on this turn. The action must be
-        represented based on the spec's instructions for representing actions.
-        """
-
-        # perform alpha beta minimax adversarial search
-        max_depth = 3
-        alpha = -100000    # neg inf
-        beta = 100000   # pos inf
-        is_max_player = True
-
-        val, move = minimax_catapult_dist(self.board_dict, self.num_black, self.num_white, self.colour, max_depth, alpha, beta, is_max_player, self.colour)
-        return move
-
-
-    def update(self, colour, action):
-        """
-        This method is called at the end of every turn (including your player’s
-        turns) to inform your player about the most recent action. You should
-        use this opportunity to maintain your internal representation of the
-        game state and any other information about the game you are storing.
-
-        The parameter colour will be a string representing the player whose turn
-        it is (White or Black). The value will be one of the strings "white" or
-        "black" correspondingly.
-
-        The parameter action is a representation of the most recent action
-        conforming to the spec's instructions for representing actions.
-
-        You may assume that action will always correspond to an allowed action
-        for the player colour (your method does not need to validate the action
-        against the game rules).
-        """
-
-        # update the board accordingly
-        self.board_dict, self.num_black, self.num_white = make_move(self.board_dict, action, self.num_black, self.num_white)
+class CatapultNonZeroPlayer(SearchPlayer):
+    evaluator = staticmethod(leaf_eval_catapult_dist)
+    max_depth = 3
+    book_file = BOOK_FILE
+    tablebase_file = TABLEBASE_FILE
+
+# player 9: monte carlo tree search with random rollouts under the game clock
+class MCTSPlayer(SearchPlayer):
+    timed = True
+
+    # seconds per move, None spreads the game clock like the timed alpha beta
+    # players. set it to another player's time per move (tournament.py
+    # reports it) to compare the two at equal time
+    move_time = None
+
+    def make_search(self):
+        if self.move_time is None:
+            clock = GameClock()
+        else:
+            clock = GameClock(min_budget=self.move_time, max_budget=self.move_time)
+        return MCTS(time_control=clock, workers=self.workers)
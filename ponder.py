@@ -0,0 +1,188 @@
+import os
+import time
+from concurrent.futures import TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from self_driving_team.util import *
+from self_driving_team.bitboard import *
+from self_driving_team.clock import *
+from self_driving_team.ordering import *
+from self_driving_team.search import *
+from self_driving_team.parallel import SharedMemory, SharedTranspositionTable, SharedTablePool
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+"""
+pondering, thinking on the opponent's time. after our move a worker process
+searches the position after the reply our principal variation predicts, into
+a transposition table shared with the main search. when the opponent plays
+that reply the main search starts with the worker's results in its table,
+otherwise the worker is stopped. what it stored stays in the table, the
+entries are keyed by position and still right
+"""
+
+# seconds choose_move waits for the worker to stop before searching anyway
+STOP_WAIT = 0.05
+
+# state of the ponder worker process, set up once by _init_ponder
+_ponder = {}
+
+"""
+virtual memory of this process in bytes, None where it can not be read
+"""
+def _memory_in_use():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+"""
+runs once in the ponder worker: drops its priority so it only gets the cpu
+nobody else wants, caps the memory it can take on top of what it already
+has, attaches to the shared table and builds the search it keeps for the game
+"""
+def _init_ponder(stop_flag, table_name, table_bytes, options, niceness, memory_bytes):
+    if niceness:
+        try:
+            os.nice(niceness)
+        except (OSError, AttributeError):
+            pass
+
+    in_use = _memory_in_use()
+    if resource is not None and memory_bytes is not None and in_use is not None:
+        soft, hard = resource.getrlimit(resource.RLIMIT_AS)
+        limit = in_use + memory_bytes
+        if hard == resource.RLIM_INFINITY or limit < hard:
+            resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+    tt = SharedTranspositionTable(table_bytes, name=table_name)
+    _ponder["search"] = Search(time_control=SharedDeadline(None, stop_flag), tt=tt,
+                               orderer=MoveOrderer(), iterative=True, **options)
+
+"""
+iterative deepening in the ponder worker from the position after the
+predicted reply, pv being what is left of the principal variation, until the
+deadline or the stop flag. returns (depth, move, score, nodes)
+"""
+def _ponder_search(board, colour, max_depth, pv, deadline):
+    search = _ponder["search"]
+    search.time_control.deadline = deadline
+    search.root_colour = colour
+    search.nodes = 0
+    search.last_pv = pv
+    search.orderer.new_search()
+    try:
+        val, move, depth = search.iterative_deepening(board, colour, max_depth)
+    except MemoryError:
+        return 0, "", None, search.nodes
+    return depth, move, val, search.nodes
+
+
+class PonderingSearch:
+    """
+    Wraps a Search to ponder on the opponent's time.
+
+    After each move it predicts the reply from the principal variation and
+    has a worker process search the position after it, storing into a
+    SharedTranspositionTable the wrapped search also uses. advance() checks
+    the reply against the prediction: a hit leaves the worker running until
+    our next choose_move(), a miss stops it.
+
+    The worker runs at the lowest priority (niceness), with its memory
+    capped at memory_bytes over what it starts with, and gives up after
+    max_seconds. choose_move() raises its stop flag before searching, it
+    stops at its next node. Where the worker or the shared table can not be
+    made the wrapped search runs as it is.
+    """
+
+    def __init__(self, search, table_bytes=16*1024*1024, max_seconds=10.0,
+                 niceness=19, memory_bytes=256*1024*1024):
+        self.search = search
+        self.max_seconds = max_seconds
+        self.shared = SharedTablePool(search, 1, table_bytes, _init_ponder, (niceness, memory_bytes))
+        self.serial = SharedMemory is None
+
+        # the ponder in progress, our move it follows and the reply it expects
+        self.future = None
+        self.own_move = None
+        self.predicted = None
+
+        self.hits = 0
+        self.misses = 0
+        self.nodes = 0
+        self.last_score = None
+        self.last_depth = 0
+
+    def close(self):
+        self.stop_pondering()
+        self.shared.close()
+
+    def choose_move(self, board, colour, max_depth):
+        """Searches the position with colour to move and returns the move to play."""
+        if not self.serial and self.shared.pool is None and not self.shared.start():
+            self.serial = True
+
+        self.stop_pondering()
+        move = self.search.choose_move(board, colour, max_depth)
+        self.nodes = self.search.nodes
+        self.last_score = self.search.last_score
+        self.last_depth = self.search.last_depth
+
+        if not self.serial:
+            try:
+                self.start_pondering(board, colour, move, max_depth)
+            except (BrokenProcessPool, OSError):
+                self.close()
+                self.serial = True
+        return move
+
+    def start_pondering(self, board, colour, move, max_depth):
+        """Has the worker search the position after move and the reply the search expects."""
+        pv = self.search.last_pv
+        if len(pv) < 2 or pv[0] != move:
+            return
+
+        board = board.copy()
+        board.make_move(move)
+        board.make_move(pv[1])
+        if not board.num_white or not board.num_black:
+            return
+
+        self.shared.stop_flag.value = 0
+        self.own_move = move
+        self.predicted = pv[1]
+        self.future = self.shared.submit(_ponder_search, board, colour, max_depth, pv[2:],
+                                         time.perf_counter() + self.max_seconds)
+
+    def stop_pondering(self):
+        """Stops the worker, waiting at most STOP_WAIT for it."""
+        if self.future is None:
+            return
+        self.shared.stop_flag.value = 1
+        try:
+            self.future.result(timeout=STOP_WAIT)
+        except (TimeoutError, BrokenProcessPool, MemoryError):
+            pass
+        self.future = None
+        self.own_move = None
+        self.predicted = None
+
+    def advance(self, move):
+        self.search.advance(move)
+        if self.predicted is None:
+            return
+
+        # our own move comes first, then the reply
+        if self.own_move is not None:
+            self.own_move = None
+            return
+
+        if move == self.predicted:
+            self.hits += 1
+            self.predicted = None
+        else:
+            self.misses += 1
+            self.stop_pondering()
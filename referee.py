@@ -0,0 +1,160 @@
+import time
+from self_driving_team.util import *
+from self_driving_team.bitboard import *
+from self_driving_team.player import *
+
+"""
+in process referee, plays two player classes against each other through the
+same action()/update() protocol the real referee uses and applies the rules:
+a player loses when it runs out of tokens or plays an illegal action, and
+the game is drawn when both run out together, when the same position comes
+up for the fourth time, or after 250 turns each
+"""
+
+# turns each player gets before the game is a draw
+MAX_TURNS = 250
+
+# times the same position (with the same player to move) can come up before
+# the game is a draw
+MAX_REPEATS = 4
+
+# the players a game or tournament can be set up with, by class name
+PLAYERS = {cls.__name__: cls for cls in (
+    GreedyPlayer, RandomPlayer, AlphaBetaPlayer, AlphaBetaNonZeroPlayer,
+    AlphaBetaTimeDist, AlphaBetaTime, CatapultPlayer, CatapultNonZeroPlayer, MCTSPlayer)}
+
+"""
+checks a value from a player is a plain int in low..high, bools and floats
+are not
+"""
+def _is_int(value, low, high):
+    return type(value) is int and low <= value <= high
+
+"""
+checks a position from a player is an (x, y) pair on the board
+"""
+def _is_position(pos):
+    try:
+        x, y = pos
+    except (TypeError, ValueError):
+        return False
+    return _is_int(x, 0, BOARD_SIZE-1) and _is_int(y, 0, BOARD_SIZE-1)
+
+"""
+checks an action from a player, which may be anything, is a legal move for
+colour on board. positions and counts are checked before the board sees them,
+it would map an off board square onto a real one
+"""
+def is_valid_action(board, action, colour):
+    try:
+        if action[0] == "BOOM" and len(action) == 2:
+            return _is_position(action[1]) and board.is_legal((action[0], tuple(action[1])), colour)
+        if action[0] == "MOVE" and len(action) == 4:
+            return (_is_int(action[1], 1, MAX_STACK) and _is_position(action[2]) and _is_position(action[3])
+                    and board.is_legal((action[0], action[1], tuple(action[2]), tuple(action[3])), colour))
+    except (TypeError, IndexError, ValueError, KeyError):
+        pass
+    return False
+
+
+class GameResult:
+    """
+    Outcome of one game: the winning colour (None for a draw), why it ended,
+    the turns played and, per colour, the moves made, the seconds spent in
+    action() and the search nodes visited.
+    """
+
+    def __init__(self, white, black):
+        self.players = {"white": white, "black": black}
+        self.winner = None
+        self.reason = None
+        self.turns = 0
+        self.moves = {"white": 0, "black": 0}
+        self.time = {"white": 0.0, "black": 0.0}
+        self.nodes = {"white": 0, "black": 0}
+
+    def to_dict(self):
+        return {
+            "white": self.players["white"],
+            "black": self.players["black"],
+            "winner": self.winner,
+            "reason": self.reason,
+            "turns": self.turns,
+            "moves": self.moves,
+            "time": self.time,
+            "nodes": self.nodes,
+        }
+
+"""
+plays white_cls against black_cls and returns the GameResult
+"""
+def play_game(white_cls, black_cls, max_turns=MAX_TURNS):
+    result = GameResult(white_cls.__name__, black_cls.__name__)
+    players = {"white": white_cls("white"), "black": black_cls("black")}
+    try:
+        return _play(players, result, max_turns)
+    finally:
+        # worker processes and shared memory go now, not whenever the
+        # players are garbage collected
+        for player in players.values():
+            if hasattr(player, "close"):
+                player.close()
+
+"""
+plays the game out between players, filling in result
+"""
+def _play(players, result, max_turns):
+    board = Board.from_dict(init_board())
+    colour = "white"
+    seen = {board.key(colour): 1}
+
+    while True:
+        player = players[colour]
+
+        # search players report the nodes of their last search
+        search = getattr(player, "search", None)
+        if search is not None:
+            search.nodes = 0
+
+        start = time.perf_counter()
+        try:
+            action = player.action()
+        except Exception as error:
+            action = error
+        result.time[colour] += time.perf_counter() - start
+        result.moves[colour] += 1
+        if search is not None:
+            result.nodes[colour] += search.nodes
+
+        if not is_valid_action(board, action, colour):
+            result.winner = colour_switch(colour)
+            result.reason = "illegal action by %s: %r" % (colour, action)
+            return result
+
+        board.make_move(action)
+        for other in players.values():
+            other.update(colour, action)
+
+        # the game ends when a colour has no tokens left
+        if not board.num_white or not board.num_black:
+            if board.num_white:
+                result.winner = "white"
+            elif board.num_black:
+                result.winner = "black"
+            result.reason = "tokens"
+            result.turns = result.moves["black"]
+            return result
+
+        colour = colour_switch(colour)
+
+        key = board.key(colour)
+        seen[key] = seen.get(key, 0) + 1
+        if seen[key] >= MAX_REPEATS:
+            result.reason = "repetition"
+            result.turns = result.moves["black"]
+            return result
+
+        if result.moves["black"] >= max_turns:
+            result.reason = "turns"
+            result.turns = max_turns
+            return result
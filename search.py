@@ -0,0 +1,519 @@
+from self_driving_team.util import *
+from self_driving_team.bitboard import *
+from self_driving_team.transposition import *
+from self_driving_team.clock import *
+from self_driving_team.ordering import STAGE_TT, STAGE_HISTORY
+from self_driving_team.batch_eval import encode_children, batch_material, batch_evaluator_for
+from self_driving_team.tablebase import TABLEBASE_WIN
+
+"""
+the alpha beta search shared by every minimax player
+
+scores are negamax style, from the point of view of the side to move. the leaf
+evaluators keep the old minimax convention and score for the root player
+(max_player_colour), the engine flips the sign for the other side
+"""
+
+# neg / pos infinity
+INFINITY = 100000
+
+# deepest iteration the time based search will start
+MAX_DEPTH = 10
+
+# width of the null windows principal variation search scouts with, well
+# under the smallest gap between two different scores (1/12 - 1/14)
+PVS_EPSILON = 1e-6
+
+# most booms the quiescence search plays past the horizon
+QS_DEPTH = 4
+
+# most a leaf evaluation moves on top of the material (the 0-1 reevaluations),
+# a boom is only searched in quiescence when its gain plus this can raise alpha
+DELTA_MARGIN = 1
+
+"""
+checks if it is end for a minimax tree
+"""
+def is_end(num_player_tokens, num_enemy_tokens, remaining_depth):
+
+    # player wins
+    if num_player_tokens == 0:
+        return True
+    # enemy wins
+    if num_enemy_tokens == 0:
+        return True
+    # max depth reached
+    if remaining_depth == 0:
+        return True
+
+    return False
+
+"""
+score of a finished game for the side to move with own tokens against enemy
+tokens, ply plies below the root. on the tablebase's scale so a won game
+scores the same whether the table covers it or not, one less for every ply
+it is away so the search plays the fastest win and the slowest loss
+"""
+def game_over_score(own, enemy, ply=0):
+    if not enemy and own:
+        return TABLEBASE_WIN - ply
+    if not own and enemy:
+        return ply - TABLEBASE_WIN
+    return 0
+
+"""
+default cutoff test, stop at max depth or when either side is out of tokens
+"""
+def depth_cutoff(board, remaining_depth):
+    return is_end(board.num_black, board.num_white, remaining_depth)
+
+
+class Search:
+    """
+    Negamax alpha beta search configured by plug-in parts:
+
+    evaluator(board, max_player_colour, colour) -- leaf score for the root player
+    cutoff(board, remaining_depth) -- True where the search stops and evaluates
+    time_control -- start/check/should_deepen/stop, see clock.py
+    tt -- optional TranspositionTable
+    orderer -- optional MoveOrderer
+    unique_booms -- search one BOOM per connected group of stacks, they all
+                    lead to the same board
+    batch_leaves -- score the last ply with one numpy call per node, used
+                    when the evaluator has a batch version (batch_eval.py)
+    tablebase -- optional Tablebase, positions it covers are scored from it
+                 instead of being searched
+    quiescence -- at the horizon keep searching booms that win material,
+                  up to QS_DEPTH of them, before evaluating
+    pvs -- principal variation search, moves after the first are scouted
+           with a null window and only re-searched when they beat it
+    aspiration -- half width of the window each iteration after the first
+                  starts with around the last score, None for full windows.
+                  a search that falls outside it widens that side by
+                  aspiration_growth times and tries again
+
+    With iterative set, choose_move deepens one ply at a time until the time
+    control says stop, otherwise it searches straight to max_depth.
+
+    The tables and the principal variation carry over from one move to the
+    next: the transposition table and the history are aged rather than
+    cleared, and advance() follows the moves played along the last principal
+    variation, so when the game goes the way it predicted the next search
+    starts down the rest of it.
+    """
+
+    def __init__(self, evaluator, cutoff=depth_cutoff, time_control=None,
+                 tt=None, orderer=None, iterative=False, unique_booms=True,
+                 batch_leaves=False, tablebase=None, quiescence=False, pvs=False,
+                 aspiration=None, aspiration_growth=4.0):
+        self.evaluator = evaluator
+        self.cutoff = cutoff
+        self.time_control = time_control if time_control is not None else NoTimeLimit()
+        self.tt = tt
+        self.orderer = orderer
+        self.iterative = iterative
+        self.unique_booms = unique_booms
+        self.tablebase = tablebase
+        self.quiescence = quiescence
+        self.pvs = pvs
+        self.aspiration = aspiration
+        self.aspiration_growth = aspiration_growth
+        self.batch_leaves = batch_leaves
+
+        # the batch evaluator replaces the last ply, so it needs leaves to be
+        # exactly the depth 0 nodes
+        self.batch_evaluator = None
+        if batch_leaves and cutoff is depth_cutoff and not quiescence:
+            self.batch_evaluator = batch_evaluator_for(evaluator)
+
+        self.root_colour = None
+        self.nodes = 0
+        self.last_score = None
+        self.last_depth = 0
+        self.last_pv = ()
+
+    def choose_move(self, board, colour, max_depth):
+        """Searches the position with colour to move and returns the move to play."""
+        # the scores stored are for the root player, only keep them for the
+        # same player
+        if self.tt is not None:
+            if colour != self.root_colour:
+                self.tt.clear()
+            else:
+                self.tt.new_search()
+        if self.orderer is not None:
+            self.orderer.new_search()
+        self.root_colour = colour
+        self.nodes = 0
+
+        self.time_control.start()
+        try:
+            if self.iterative:
+                val, move, depth = self.iterative_deepening(board, colour, max_depth)
+            else:
+                val, move = self.negamax(board, colour, max_depth, -INFINITY, INFINITY, self.last_pv)
+                depth = max_depth
+                self.last_pv = self.principal_variation(board, colour, move, depth) if move else ()
+        finally:
+            self.time_control.stop()
+
+        self.last_score = val
+        self.last_depth = depth
+        return move
+
+    def iterative_deepening(self, board, colour, max_depth):
+        """
+        Searches to depth 1, 2, 3 ... and returns (val, move, depth) from the
+        last iteration that completed before the time ran out.
+        """
+        # an abandoned iteration leaves its moves made, so search a copy
+        board = board.copy()
+
+        # fallback if not even depth 1 finishes
+        moves = board.all_moves(colour)
+        val, move, depth = None, moves[0] if moves else "", 0
+
+        # what is left of the last move's principal variation
+        pv = self.last_pv
+
+        for d in range(1, max_depth+1):
+            try:
+                if self.aspiration is not None and val is not None:
+                    val, move = self.aspiration_search(board, colour, d, val, pv)
+                else:
+                    val, move = self.negamax(board, colour, d, -INFINITY, INFINITY, pv)
+            except SearchTimeout:
+                break
+            depth = d
+
+            # nothing left to search, deeper iterations give the same answer
+            if not move:
+                break
+
+            # seed the next iteration with this one's principal variation
+            pv = self.principal_variation(board, colour, move, d)
+            self.last_pv = pv
+
+            if not self.time_control.should_deepen():
+                break
+
+        return val, move, depth
+
+    def advance(self, move):
+        """
+        Follows a move played in the game along the principal variation, it
+        is dropped once the game leaves it.
+        """
+        if self.last_pv and self.last_pv[0] == move:
+            self.last_pv = self.last_pv[1:]
+        else:
+            self.last_pv = ()
+
+    def aspiration_search(self, board, colour, depth, guess, pv):
+        """
+        Searches with a window around guess, the last iteration's score,
+        widening whichever side the score falls outside of until it lands
+        inside. Returns (val, move).
+        """
+        low = high = self.aspiration
+        while True:
+            alpha = guess - low if low is not None else -INFINITY
+            beta = guess + high if high is not None else INFINITY
+            val, move = self.negamax(board, colour, depth, alpha, beta, pv)
+
+            if val <= alpha and low is not None:
+                low *= self.aspiration_growth
+                if guess - low <= -INFINITY or low > INFINITY:
+                    low = None
+            elif val >= beta and high is not None:
+                high *= self.aspiration_growth
+                if guess + high >= INFINITY or high > INFINITY:
+                    high = None
+            else:
+                return val, move
+
+    def principal_variation(self, board, colour, move, depth):
+        """Follows the stored best moves from the root to get the principal variation."""
+        pv = [move]
+        if self.tt is None:
+            return tuple(pv)
+
+        undos = [board.make_move(move)]
+        colour = colour_switch(colour)
+
+        while len(pv) < depth:
+            entry = self.tt.probe(board.key(colour))
+            if entry is None or not entry[4]:
+                break
+            pv.append(entry[4])
+            undos.append(board.make_move(entry[4]))
+            colour = colour_switch(colour)
+
+        # take the moves back in reverse order
+        for undo in reversed(undos):
+            board.unmake_move(undo)
+
+        return tuple(pv)
+
+    def ordered_moves(self, board, colour, remaining_depth, tt_move, pv_move):
+        """
+        Yields (move, stage, num_moves) in search order. The pv and stored
+        best moves come first and the rest are only generated once those are
+        searched, so a cutoff on them never pays for move generation. Until
+        then num_moves is None. Without an orderer there is nothing to sort,
+        the rest come a stack at a time from iter_moves so a cutoff skips the
+        stacks after it, and num_moves stays None.
+        """
+        orderer = self.orderer
+        first = []
+        if orderer is not None and not orderer.use_tt:
+            pv_move = tt_move = None
+        for move in (pv_move, tt_move):
+            if move and move not in first and board.is_legal(move, colour):
+                first.append(move)
+                if orderer is not None:
+                    orderer.first(move)
+                yield move, STAGE_TT, None
+
+        if orderer is None:
+            # with unique booms another stack of the same group may stand for
+            # a boom already searched
+            searched = 0
+            if self.unique_booms:
+                for move in first:
+                    if move[0] == "BOOM":
+                        searched |= blast_region(board.white | board.black, to_square(move[1]))
+            for move in board.iter_moves(colour, self.unique_booms):
+                if move in first or move[0] == "BOOM" and searched >> to_square(move[1]) & 1:
+                    continue
+                yield move, STAGE_HISTORY, None
+            return
+
+        # generating the rest of the moves
+        moves = board.all_moves(colour, self.unique_booms)
+        for move in first:
+            if move in moves:
+                moves.remove(move)
+            elif move[0] == "BOOM":
+                # another stack of the same group stands for this boom
+                region = blast_region(board.white | board.black, to_square(move[1]))
+                moves = [other for other in moves if other[0] != "BOOM" or not region >> to_square(other[1]) & 1]
+        num_moves = len(moves) + len(first)
+
+        moves, stages = orderer.order(board, moves, colour, remaining_depth)
+        for move, stage in zip(moves, stages):
+            yield move, stage, num_moves
+
+    def options(self):
+        """
+        The constructor arguments that decide how positions are scored, to
+        build the same search in another process (parallel.py). The time
+        control, tables and iterative setting are left to the caller.
+        """
+        return dict(evaluator=self.evaluator, cutoff=self.cutoff, unique_booms=self.unique_booms,
+                    batch_leaves=self.batch_leaves, tablebase=self.tablebase,
+                    quiescence=self.quiescence, pvs=self.pvs, aspiration=self.aspiration,
+                    aspiration_growth=self.aspiration_growth)
+
+    def last_ply(self, board, colour, ply=0):
+        """
+        Scores every child of a depth 1 node, ply plies below the root, with
+        one batch evaluation and returns (score, move) for the best one.
+        """
+        moves = board.all_moves(colour, self.unique_booms)
+        if not moves:
+            return (self.leaf(board, colour, ply), "")
+
+        self.nodes += len(moves)
+
+        # the evaluator scores for the root player, turn it into our score
+        planes = encode_children(board, moves)
+        scores = self.batch_evaluator(planes, self.root_colour, colour_switch(colour))
+        if colour != self.root_colour:
+            scores = -scores
+
+        # finished games score as in leaf
+        num_white, num_black = batch_material(planes)
+        over = (num_white == 0) | (num_black == 0)
+        if over.any():
+            own, enemy = (num_white, num_black) if colour == "white" else (num_black, num_white)
+            won = (own > 0).astype(int) - (enemy > 0)
+            scores[over] = (TABLEBASE_WIN - (ply+1))*won[over]
+
+        # and solved endgames as in negamax
+        if self.tablebase is not None:
+            covered = ~over & (num_white + num_black <= self.tablebase.max_tokens)
+            next_colour = colour_switch(colour)
+            for i in covered.nonzero()[0]:
+                undo = board.make_move(moves[i])
+                scores[i] = -self.table_score(board, next_colour, ply+1)
+                board.unmake_move(undo)
+
+        best = int(scores.argmax())
+        return (float(scores[best]), moves[best])
+
+    def table_score(self, board, colour, ply):
+        """
+        Tablebase score for colour to move ply plies below the root, None
+        without a table or for a board it does not cover.
+        """
+        if self.tablebase is None:
+            return None
+        score = self.tablebase.score(board, colour)
+        if score is None:
+            return None
+        return score_to_root(score, ply)
+
+    def leaf(self, board, colour, ply=0):
+        """Leaf score for the side to move ply plies below the root, finished games as game_over_score."""
+        if not board.num_white or not board.num_black:
+            if colour == "white":
+                return game_over_score(board.num_white, board.num_black, ply)
+            return game_over_score(board.num_black, board.num_white, ply)
+        score = self.evaluator(board, self.root_colour, colour)
+        if colour == self.root_colour:
+            return score
+        return -score
+
+    def winning_booms(self, board, colour):
+        """
+        (gain, move) for every boom that wins material for colour or takes
+        the last enemy tokens, one per group of stacks. booms that end the
+        game come first, whatever they cost, then the biggest gain first.
+        """
+        booms = []
+        covered = 0
+        enemy_tokens = board.num_black if colour == "white" else board.num_white
+        for sq in iter_squares(board.occupancy(colour)):
+            if covered >> sq & 1:
+                continue
+            move = ("BOOM", POSITIONS[sq])
+            region, white_removed, black_removed = board.blast(sq)
+            covered |= region
+            gain = black_removed - white_removed if colour == "white" else white_removed - black_removed
+            enemy_removed = black_removed if colour == "white" else white_removed
+            if gain > 0 or enemy_removed == enemy_tokens:
+                booms.append((gain, move, enemy_removed == enemy_tokens))
+        booms.sort(key=lambda item: (not item[2], -item[0]))
+        return [(gain, move) for gain, move, ends_game in booms]
+
+    def quiesce(self, board, colour, alpha, beta, qs_depth, ply=0):
+        """
+        Score for colour to move once the search is past its depth, ply plies
+        below the root: the better of standing pat on the leaf score and
+        playing a winning boom.
+        """
+        stand_pat = self.leaf(board, colour, ply)
+        if stand_pat >= beta or qs_depth == 0:
+            return stand_pat
+        alpha = max(alpha, stand_pat)
+
+        next_colour = colour_switch(colour)
+        val = stand_pat
+        for gain, move in self.winning_booms(board, colour):
+            undo = board.make_move(move)
+            table_score = self.table_score(board, next_colour, ply+1)
+            if not board.num_white or not board.num_black:
+                score = -self.leaf(board, next_colour, ply+1)
+            elif table_score is not None:
+                score = -table_score
+            elif stand_pat + gain + DELTA_MARGIN <= alpha:
+                # delta pruning, only the evaluator's score is bounded by
+                # the gain. the bound returned has to cover what the boom
+                # could reach, stand_pat alone would be too low
+                board.unmake_move(undo)
+                val = max(val, stand_pat + gain + DELTA_MARGIN)
+                continue
+            else:
+                score = -self.quiesce(board, next_colour, -beta, -alpha, qs_depth-1, ply+1)
+            self.nodes += 1
+            board.unmake_move(undo)
+
+            if score > val:
+                val = score
+            alpha = max(alpha, val)
+            if alpha >= beta:
+                break
+
+        return val
+
+    def negamax(self, board, colour, remaining_depth, alpha, beta, pv=(), ply=0):
+        """
+        Returns (score, move) for colour to move ply plies below the root, pv
+        is the principal variation of the previous iteration and is searched
+        first.
+        """
+        self.nodes += 1
+        self.time_control.check()
+
+        # if at max depth or game over return the current eval
+        if self.cutoff(board, remaining_depth):
+            if self.quiescence and remaining_depth <= 0 and board.num_white and board.num_black:
+                return (self.quiesce(board, colour, alpha, beta, QS_DEPTH, ply), "")
+            return (self.leaf(board, colour, ply), "")
+
+        # transposition table lookup, a stored result can decide the node
+        alpha_orig, beta_orig = alpha, beta
+        tt = self.tt
+        tt_move = None
+        if tt is not None:
+            key = board.key(colour)
+            score, alpha, beta, tt_move = tt.lookup(key, remaining_depth, alpha, beta, ply)
+            if score is not None:
+                return (score, tt_move)
+
+        # last ply, score all the children in one batch
+        if remaining_depth == 1 and self.batch_evaluator is not None:
+            val, selected_move = self.last_ply(board, colour, ply)
+            if tt is not None and selected_move:
+                tt.store(key, remaining_depth, val, bound_flag(val, alpha_orig, beta_orig), selected_move, ply)
+            return (val, selected_move)
+
+        # the other player moves in the children
+        next_colour = colour_switch(colour)
+
+        pv_move = pv[0] if pv else None
+        orderer = self.orderer
+        selected_move = None
+        val = -INFINITY
+        for i, (move, stage, num_moves) in enumerate(self.ordered_moves(board, colour, remaining_depth, tt_move, pv_move)):
+            undo = board.make_move(move)
+
+            # a solved endgame needs no search below it
+            score = self.table_score(board, next_colour, ply+1)
+            if score is not None:
+                score = -score
+            else:
+                # score from the level below, only the pv move passes the pv on
+                child_pv = pv[1:] if move == pv_move else ()
+                if self.pvs and selected_move is not None:
+                    # scout with a null window, a move that beats alpha is
+                    # searched again with the full one
+                    score = -self.negamax(board, next_colour, remaining_depth-1, -alpha-PVS_EPSILON, -alpha, child_pv, ply+1)[0]
+                    if alpha < score < beta:
+                        score = -self.negamax(board, next_colour, remaining_depth-1, -beta, -alpha, child_pv, ply+1)[0]
+                else:
+                    score = -self.negamax(board, next_colour, remaining_depth-1, -beta, -alpha, child_pv, ply+1)[0]
+            board.unmake_move(undo)
+
+            if selected_move is None or score > val:
+                val = score
+                selected_move = move
+
+            # update alpha
+            alpha = max(alpha, val)
+
+            # beta cutoff
+            if alpha >= beta:
+                if orderer is not None:
+                    orderer.cutoff(move, stage, remaining_depth, i, num_moves)
+                break
+
+        # if can not generate any moves, return
+        if selected_move is None:
+            return (self.leaf(board, colour, ply), "")
+
+        # remember the result for transpositions
+        if tt is not None:
+            tt.store(key, remaining_depth, val, bound_flag(val, alpha_orig, beta_orig), selected_move, ply)
+        return (val, selected_move)
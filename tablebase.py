@@ -0,0 +1,225 @@
+import os
+import struct
+from itertools import combinations
+from self_driving_team.util import *
+from self_driving_team.bitboard import *
+from self_driving_team.tables import *
+
+"""
+endgame tablebase, the solved value of every position with at most a few
+tokens left, built offline by value iteration and probed by the search
+
+build one with
+    python -m self_driving_team.make_tablebase [--tokens K] [--output PATH]
+"""
+
+TABLEBASE_MAGIC = b"EXPENDTB"
+
+# header: the most tokens (both colours together) the table covers
+TABLEBASE_HEADER = struct.Struct("<I")
+
+# key, result for the side to move, plies to the end of the game
+TABLEBASE_RECORD = struct.Struct("<QbB")
+
+# results for the side to move, draws are not stored: a covered position
+# missing from the table is a draw
+WIN = 1
+LOSS = -1
+DRAW = 0
+
+# search score of a win, less the plies it takes so faster wins score higher
+TABLEBASE_WIN = 1000
+
+# where players look for the tablebase, next to this module
+TABLEBASE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "endgame.tablebase")
+
+"""
+every way to put stacks holding tokens tokens on squares not in used, as
+lists of (square, height)
+"""
+def _placements(tokens, used, max_part=None):
+    if tokens == 0:
+        yield []
+        return
+    if max_part is None:
+        max_part = tokens
+
+    # the tallest stacks first, stacks of the same height as a combination
+    # of squares so no placement comes up twice
+    for height in range(min(tokens, max_part), 0, -1):
+        for count in range(tokens // height, 0, -1):
+            free = [sq for sq in range(NUM_SQUARES) if sq not in used]
+            for squares in combinations(free, count):
+                stacks = [(sq, height) for sq in squares]
+                for rest in _placements(tokens - height*count, used | set(squares), height-1):
+                    yield stacks + rest
+
+"""
+every board with at least one token of each colour and at most max_tokens
+tokens in total
+"""
+def endgame_boards(max_tokens):
+    for num_white in range(1, max_tokens):
+        for num_black in range(1, max_tokens - num_white + 1):
+            for white in _placements(num_white, set()):
+                used = {sq for sq, n in white}
+                for black in _placements(num_black, used):
+                    board_dict = {POSITIONS[sq]: "W " + str(n) for sq, n in white}
+                    board_dict.update((POSITIONS[sq], "B " + str(n)) for sq, n in black)
+                    yield Board.from_dict(board_dict)
+
+"""
+result of the game for the side with own tokens against enemy tokens, None
+while both sides still have tokens
+"""
+def _game_over(own, enemy):
+    if own and enemy:
+        return None
+    if own:
+        return WIN
+    if enemy:
+        return LOSS
+    return DRAW
+
+"""
+solves every position with at most max_tokens tokens, returns {key: (result,
+plies)} for the won and lost ones, the rest are draws (including the ones
+that repeat forever)
+
+value iteration: each pass settles the positions whose moves lead to
+settled positions, so a position settled in pass k is won or lost in k
+plies. passes repeat until one settles nothing new
+"""
+def solve_endgames(max_tokens, progress=None):
+    solved = {}
+    unsolved = [(board, colour) for board in endgame_boards(max_tokens)
+                for colour in ("white", "black")]
+
+    plies = 0
+    while unsolved:
+        plies += 1
+        settled = {}
+        still_unsolved = []
+        for board, colour in unsolved:
+            result = None
+            all_lost = True
+            for move in board.all_moves(colour, unique_booms=True):
+                undo = board.make_move(move)
+                if colour == "white":
+                    over = _game_over(board.num_white, board.num_black)
+                else:
+                    over = _game_over(board.num_black, board.num_white)
+                if over is None:
+                    child = solved.get(board.key(colour_switch(colour)))
+                    over = -child[0] if child is not None else None
+                board.unmake_move(undo)
+
+                if over == WIN:
+                    result = WIN
+                    break
+                if over != LOSS:
+                    all_lost = False
+
+            if result is None and all_lost:
+                result = LOSS
+            if result is None:
+                still_unsolved.append((board, colour))
+            else:
+                settled[board.key(colour)] = (result, plies)
+
+        if not settled:
+            break
+        solved.update(settled)
+        unsolved = still_unsolved
+        if progress is not None:
+            progress(plies, len(solved), len(unsolved))
+
+    return solved
+
+"""
+solves the endgames with at most max_tokens tokens and writes the tablebase
+to path, returns the number of won and lost positions stored
+"""
+def build_tablebase(path, max_tokens=3, progress=None):
+    solved = solve_endgames(max_tokens, progress)
+    records = [(key, result, plies) for key, (result, plies) in solved.items()]
+    write_table(path, TABLEBASE_MAGIC, TABLEBASE_RECORD, records,
+                TABLEBASE_HEADER.pack(max_tokens))
+    return len(records)
+
+
+class Tablebase:
+    """
+    A tablebase file, mapped with mmap on the first probe so loading it costs
+    nothing until the game gets down to max_tokens tokens.
+    """
+
+    def __init__(self, path=TABLEBASE_FILE):
+        self.path = path
+        self.table = None
+
+        # read the header only, to know which positions are covered
+        with open(path, "rb") as f:
+            head = f.read(len(TABLEBASE_MAGIC) + TABLEBASE_HEADER.size)
+        if head[:len(TABLEBASE_MAGIC)] != TABLEBASE_MAGIC:
+            raise ValueError("%s is not a %s table" % (path, TABLEBASE_MAGIC.decode()))
+        self.max_tokens = TABLEBASE_HEADER.unpack(head[len(TABLEBASE_MAGIC):])[0]
+
+    def __getstate__(self):
+        # the mapping is not sent to other processes, they map the file themselves
+        state = self.__dict__.copy()
+        state["table"] = None
+        return state
+
+    def covers(self, board):
+        return board.num_white + board.num_black <= self.max_tokens
+
+    def probe(self, board, colour):
+        """
+        (result, plies) for colour to move on a covered board, None for a
+        board the table does not cover.
+        """
+        if not self.covers(board):
+            return None
+
+        # finished games are covered too, so the search scores a win on the
+        # board the same as one in the table
+        if colour == "white":
+            over = _game_over(board.num_white, board.num_black)
+        else:
+            over = _game_over(board.num_black, board.num_white)
+        if over is not None:
+            return over, 0
+
+        if self.table is None:
+            self.table = MappedTable(self.path, TABLEBASE_MAGIC, TABLEBASE_RECORD,
+                                     TABLEBASE_HEADER.size)
+        entry = self.table.find(board.key(colour))
+        if entry is None:
+            return DRAW, 0
+        return entry[1], entry[2]
+
+    def score(self, board, colour):
+        """Search score for colour to move, None for a board the table does not cover."""
+        probe = self.probe(board, colour)
+        if probe is None:
+            return None
+        result, plies = probe
+        if result == WIN:
+            return TABLEBASE_WIN - plies
+        if result == LOSS:
+            return plies - TABLEBASE_WIN
+        return 0
+
+    def close(self):
+        if self.table is not None:
+            self.table.close()
+            self.table = None
+
+"""
+the tablebase at path, None if there is none there
+"""
+def load_tablebase(path=TABLEBASE_FILE):
+    if path is None or not os.path.exists(path):
+        return None
+    return Tablebase(path)
@@ -0,0 +1,66 @@
+import mmap
+import struct
+
+"""
+sorted binary tables of fixed size records keyed by a 64 bit position key,
+read through mmap with a binary search so nothing is parsed at load time.
+used by the opening book and the endgame tablebase
+
+file layout: a magic string naming the table type, an optional fixed size
+header, then the records sorted by key, each starting with the key as a
+little endian uint64
+"""
+
+KEY = struct.Struct("<Q")
+
+"""
+writes records, tuples for the record struct with the key first, to path as
+a sorted table
+"""
+def write_table(path, magic, record, records, header=b""):
+    with open(path, "wb") as f:
+        f.write(magic)
+        f.write(header)
+        for values in sorted(records, key=lambda values: values[0]):
+            f.write(record.pack(*values))
+
+
+class MappedTable:
+    """
+    A table written by write_table, mapped read only. find(key) binary
+    searches the mapped file, so only the pages it touches are read.
+    """
+
+    def __init__(self, path, magic, record, header_size=0):
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.map[:len(magic)] != magic:
+            self.close()
+            raise ValueError("%s is not a %s table" % (path, magic.decode()))
+        self.record = record
+        self.header = self.map[len(magic):len(magic)+header_size]
+        self.start = len(magic) + header_size
+        self.count = (len(self.map) - self.start) // record.size
+
+    def __len__(self):
+        return self.count
+
+    def find(self, key):
+        """The record for key as a tuple, or None."""
+        size = self.record.size
+        lo = 0
+        hi = self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            mid_key = KEY.unpack_from(self.map, self.start + mid*size)[0]
+            if mid_key < key:
+                lo = mid + 1
+            elif mid_key > key:
+                hi = mid
+            else:
+                return self.record.unpack_from(self.map, self.start + mid*size)
+        return None
+
+    def close(self):
+        self.map.close()
+        self.file.close()
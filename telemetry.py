@@ -0,0 +1,204 @@
+import os
+import sys
+import json
+import time
+from self_driving_team.util import *
+from self_driving_team.search import *
+
+"""
+per move search telemetry. InstrumentedSearch is a Search that counts and
+times what it does and hands one record per move to a sink. players pick it
+instead of the plain Search when they are built with a sink, so a player
+without one runs the plain search with no checks added
+
+a sink is any object with emit(record), record being a json ready dict
+"""
+
+# set to a file path to have the players write telemetry there
+TELEMETRY_ENV = "EXPENDIBOTS_TELEMETRY"
+
+
+class JsonLinesSink:
+    """Writes each record as one json line to a file (path or open file)."""
+
+    def __init__(self, target=sys.stderr):
+        if isinstance(target, str):
+            self.file = open(target, "a")
+        else:
+            self.file = target
+
+    def emit(self, record):
+        self.file.write(json.dumps(record) + "\n")
+        self.file.flush()
+
+
+class ListSink:
+    """Keeps the records in a list, for tests and notebooks."""
+
+    def __init__(self):
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+"""
+the sink named by the EXPENDIBOTS_TELEMETRY environment variable, None when
+it is not set
+"""
+def sink_from_env():
+    path = os.environ.get(TELEMETRY_ENV)
+    if not path:
+        return None
+    return JsonLinesSink(path)
+
+
+class RecordingOrderer:
+    """
+    Wraps a MoveOrderer to also note the ply and move index of every cutoff.
+    """
+
+    def __init__(self, orderer, search):
+        self.orderer = orderer
+        self.search = search
+
+    def __getattr__(self, name):
+        return getattr(self.orderer, name)
+
+    def cutoff(self, move, stage, depth, index, num_moves):
+        self.search.record_cutoff(stage, index)
+        self.orderer.cutoff(move, stage, depth, index, num_moves)
+
+
+class InstrumentedSearch(Search):
+    """
+    Search that emits one record per move to sink with: nodes per ply,
+    cutoffs per ply and per move index, the effective branching factor, tt
+    probes and hits, seconds spent generating and ordering moves, making and
+    unmaking them and evaluating leaves, and the principal variation.
+    """
+
+    def __init__(self, evaluator, sink, **kwargs):
+        super().__init__(evaluator, **kwargs)
+        self.sink = sink
+        if self.orderer is not None:
+            self.orderer = RecordingOrderer(self.orderer, self)
+        self.reset_telemetry()
+
+    def reset_telemetry(self):
+        self.ply = 0
+        self.ply_nodes = {}
+        self.ply_cutoffs = {}
+        self.index_cutoffs = {}
+        self.stage_cutoffs = {}
+        self.movegen_time = 0.0
+        self.make_time = 0.0
+        self.eval_time = 0.0
+        self.timed_boards = []
+
+    def record_cutoff(self, stage, index):
+        # negamax has already stepped self.ply past the node that cut off
+        ply = self.ply - 1
+        self.ply_cutoffs[ply] = self.ply_cutoffs.get(ply, 0) + 1
+        self.index_cutoffs[index] = self.index_cutoffs.get(index, 0) + 1
+        self.stage_cutoffs[stage] = self.stage_cutoffs.get(stage, 0) + 1
+
+    def choose_move(self, board, colour, max_depth):
+        self.reset_telemetry()
+        if self.orderer is not None:
+            self.orderer.reset_stats()
+        probes, hits = (self.tt.probes, self.tt.hits) if self.tt is not None else (0, 0)
+
+        start = time.perf_counter()
+        try:
+            move = super().choose_move(board, colour, max_depth)
+        finally:
+            # take the timing wrappers back off the boards
+            for timed in self.timed_boards:
+                del timed.make_move
+                del timed.unmake_move
+            self.timed_boards = []
+        elapsed = time.perf_counter() - start
+
+        pv = self.last_pv
+
+        depth = max(self.last_depth, 1)
+        record = {
+            "colour": colour,
+            "move": move,
+            "score": self.last_score,
+            "depth": self.last_depth,
+            "max_depth": max_depth,
+            "seconds": elapsed,
+            "nodes": self.nodes,
+            "nodes_per_second": self.nodes / elapsed if elapsed else 0.0,
+            "nodes_per_ply": self.ply_nodes,
+            "cutoffs_per_ply": self.ply_cutoffs,
+            "cutoffs_per_move_index": self.index_cutoffs,
+            "cutoffs_per_stage": self.stage_cutoffs,
+            "branching_factor": self.nodes ** (1/depth),
+            "tt_probes": (self.tt.probes - probes) if self.tt is not None else 0,
+            "tt_hits": (self.tt.hits - hits) if self.tt is not None else 0,
+            "movegen_seconds": self.movegen_time,
+            "make_move_seconds": self.make_time,
+            "eval_seconds": self.eval_time,
+            "pv": list(pv),
+        }
+        if self.orderer is not None:
+            record["ordering"] = self.orderer.report()
+        self.sink.emit(record)
+        return move
+
+    def time_board(self, board):
+        """Shadows the board's make_move and unmake_move with timed versions."""
+        make_move = board.make_move
+        unmake_move = board.unmake_move
+
+        def timed_make_move(move):
+            start = time.perf_counter()
+            undo = make_move(move)
+            self.make_time += time.perf_counter() - start
+            return undo
+
+        def timed_unmake_move(undo):
+            start = time.perf_counter()
+            unmake_move(undo)
+            self.make_time += time.perf_counter() - start
+
+        board.make_move = timed_make_move
+        board.unmake_move = timed_unmake_move
+        self.timed_boards.append(board)
+
+    def negamax(self, board, colour, remaining_depth, alpha, beta, pv=(), ply=0):
+        if "make_move" not in board.__dict__:
+            self.time_board(board)
+
+        self.ply_nodes[self.ply] = self.ply_nodes.get(self.ply, 0) + 1
+        self.ply += 1
+        try:
+            return super().negamax(board, colour, remaining_depth, alpha, beta, pv, ply)
+        finally:
+            self.ply -= 1
+
+    def ordered_moves(self, board, colour, remaining_depth, tt_move, pv_move):
+        moves = super().ordered_moves(board, colour, remaining_depth, tt_move, pv_move)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(moves)
+            except StopIteration:
+                self.movegen_time += time.perf_counter() - start
+                return
+            self.movegen_time += time.perf_counter() - start
+            yield item
+
+    def leaf(self, board, colour, ply=0):
+        start = time.perf_counter()
+        score = super().leaf(board, colour, ply)
+        self.eval_time += time.perf_counter() - start
+        return score
+
+    def last_ply(self, board, colour, ply=0):
+        start = time.perf_counter()
+        result = super().last_ply(board, colour, ply)
+        self.eval_time += time.perf_counter() - start
+        return result
@@ -0,0 +1,154 @@
+import sys
+import math
+import json
+import random
+import argparse
+from itertools import combinations
+from concurrent.futures import ProcessPoolExecutor
+from self_driving_team.referee import *
+
+"""
+round robin tournaments between the players, games run in parallel across a
+process pool. reports each player's score with a confidence interval, its
+average time per move and its search speed
+
+    python -m self_driving_team.tournament --players AlphaBetaPlayer CatapultNonZeroPlayer --games 200
+
+--move-time fixes the seconds per move of the players that take one
+(MCTSPlayer), to play them against another player at that player's time
+per move
+"""
+
+# z for a 95% confidence interval
+Z_95 = 1.96
+
+"""
+wilson score interval for successes out of n (a draw counts half), returns
+(low, high)
+"""
+def wilson_interval(successes, n, z=Z_95):
+    if n == 0:
+        return 0.0, 1.0
+    p = successes / n
+    denominator = 1 + z*z/n
+    centre = (p + z*z/(2*n)) / denominator
+    margin = z*math.sqrt(p*(1-p)/n + z*z/(4*n*n)) / denominator
+    return max(0.0, centre - margin), min(1.0, centre + margin)
+
+"""
+the player class with its move_time set, for the players that have one
+"""
+def with_move_time(cls, move_time):
+    if move_time is None or not hasattr(cls, "move_time"):
+        return cls
+    return type(cls.__name__, (cls,), {"move_time": move_time})
+
+"""
+plays one game in a worker, spec is (white name, black name, seed, max turns,
+move time)
+"""
+def _play(spec):
+    white, black, seed, max_turns, move_time = spec
+    random.seed(seed)
+    return play_game(with_move_time(PLAYERS[white], move_time),
+                     with_move_time(PLAYERS[black], move_time), max_turns).to_dict()
+
+"""
+the games of a round robin, every pairing games times with the colours
+alternating
+"""
+def schedule(names, games, seed=0, max_turns=MAX_TURNS, move_time=None):
+    specs = []
+    for first, second in combinations(names, 2):
+        for i in range(games):
+            white, black = (first, second) if i % 2 == 0 else (second, first)
+            specs.append((white, black, seed + len(specs), max_turns, move_time))
+    return specs
+
+"""
+plays every spec, on workers processes when there are more than one, and
+returns the game results as dicts
+"""
+def play_games(specs, workers=None):
+    if workers == 1:
+        return [_play(spec) for spec in specs]
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(_play, specs, chunksize=max(1, len(specs) // (4*(workers or 8)))))
+    except (OSError, NotImplementedError):
+        return [_play(spec) for spec in specs]
+
+"""
+per player totals from a list of game results: games, wins, draws, losses,
+score and its 95% interval, average seconds per move and nodes per second
+"""
+def summarise(results):
+    stats = {}
+    for game in results:
+        for colour in ("white", "black"):
+            name = game[colour]
+            player = stats.setdefault(name, {"games": 0, "wins": 0, "draws": 0, "losses": 0,
+                                             "moves": 0, "time": 0.0, "nodes": 0})
+            player["games"] += 1
+            if game["winner"] is None:
+                player["draws"] += 1
+            elif game["winner"] == colour:
+                player["wins"] += 1
+            else:
+                player["losses"] += 1
+            player["moves"] += game["moves"][colour]
+            player["time"] += game["time"][colour]
+            player["nodes"] += game["nodes"][colour]
+
+    for player in stats.values():
+        points = player["wins"] + player["draws"]/2
+        player["score"] = points / player["games"]
+        player["score_interval"] = wilson_interval(points, player["games"])
+        player["move_latency"] = player["time"] / max(player["moves"], 1)
+        player["nodes_per_second"] = player["nodes"] / player["time"] if player["time"] else 0.0
+    return stats
+
+"""
+plays a round robin of games games per pairing and returns (results, stats)
+"""
+def run_tournament(names, games=100, workers=None, seed=0, max_turns=MAX_TURNS, move_time=None):
+    results = play_games(schedule(names, games, seed, max_turns, move_time), workers)
+    return results, summarise(results)
+
+"""
+the summary as a table, one line per player, best score first
+"""
+def format_stats(stats):
+    lines = ["%-24s %6s %5s %5s %5s %7s %15s %10s %10s" % (
+        "player", "games", "win", "draw", "loss", "score", "95% interval", "s/move", "nodes/s")]
+    for name, player in sorted(stats.items(), key=lambda item: -item[1]["score"]):
+        low, high = player["score_interval"]
+        lines.append("%-24s %6d %5d %5d %5d %7.3f %7.3f-%-7.3f %10.4f %10.0f" % (
+            name, player["games"], player["wins"], player["draws"], player["losses"],
+            player["score"], low, high, player["move_latency"], player["nodes_per_second"]))
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="play a round robin tournament between players")
+    parser.add_argument("--players", nargs="+", choices=sorted(PLAYERS), required=True)
+    parser.add_argument("--games", type=int, default=100, help="games per pairing")
+    parser.add_argument("--workers", type=int, default=None, help="processes, default every core")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-turns", type=int, default=MAX_TURNS)
+    parser.add_argument("--move-time", type=float, default=None,
+                        help="seconds per move for the players with a fixed move time (MCTSPlayer)")
+    parser.add_argument("--results", help="write every game result to this file as json lines")
+    args = parser.parse_args(argv)
+
+    results, stats = run_tournament(args.players, args.games, args.workers, args.seed,
+                                    args.max_turns, args.move_time)
+    if args.results:
+        with open(args.results, "w") as f:
+            for game in results:
+                f.write(json.dumps(game) + "\n")
+    print(format_stats(stats))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+import random
+
+"""
+zobrist hashing and the transposition table shared by the minimax variants
+"""
+
+# bound types stored with a score
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+# rough size in bytes of one stored entry (slot + tuple + boxed values)
+ENTRY_BYTES = 128
+
+# zobrist keys, fixed seed so hashes are the same in every process
+_rng = random.Random(30024)
+
+# ZOBRIST_WHITE[sq][n] / ZOBRIST_BLACK[sq][n] is the key of a stack of n tokens
+# on square sq, index 0 is 0 so empty squares never change the hash
+ZOBRIST_WHITE = [[0] + [_rng.getrandbits(64) for n in range(12)] for sq in range(64)]
+ZOBRIST_BLACK = [[0] + [_rng.getrandbits(64) for n in range(12)] for sq in range(64)]
+
+# xor-ed in when black is to move
+SIDE_KEY = _rng.getrandbits(64)
+
+# scores past +-WIN_SCORE are won and lost games (TABLEBASE_WIN less the
+# plies to the end, search.py), everything the evaluators return is far below
+WIN_SCORE = 500
+
+"""
+a win or loss score seen from the root as seen from a position ply plies
+below it, where the end is ply plies closer. other scores stay as they are
+"""
+def score_from_root(score, ply):
+    if score > WIN_SCORE:
+        return score + ply
+    if score < -WIN_SCORE:
+        return score - ply
+    return score
+
+"""
+a win or loss score seen from a position ply plies below the root as seen
+from the root, the inverse of score_from_root
+"""
+def score_to_root(score, ply):
+    if score > WIN_SCORE:
+        return score - ply
+    if score < -WIN_SCORE:
+        return score + ply
+    return score
+
+"""
+returns the bound type for a score searched with the window (alpha, beta)
+"""
+def bound_flag(score, alpha, beta):
+    if score <= alpha:
+        return UPPER
+    if score >= beta:
+        return LOWER
+    return EXACT
+
+
+class TranspositionTable:
+    """
+    Fixed-size hash table of search results keyed by zobrist hash.
+
+    Each slot holds (key, depth, score, flag, move, generation), win and
+    loss scores counted from the stored position so a transposition at
+    another ply reads them right (store() and lookup() take the ply). A slot is
+    indexed by the low bits of the key, and a new result replaces the old one
+    when it is for the same position, was searched at least as deep
+    (depth-preferred) or the old one is from an earlier search. The table is
+    kept between moves, new_search() starts the next generation so entries
+    left over from earlier moves are the first to be overwritten.
+    """
+
+    def __init__(self, max_bytes=16*1024*1024):
+        # largest power of two number of slots that fits in max_bytes
+        size = 1
+        while size*2*ENTRY_BYTES <= max_bytes:
+            size *= 2
+        self.size = size
+        self.mask = size - 1
+        self.slots = [None] * size
+        self.generation = 0
+
+        # counters for checking the table pays off
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+
+    def clear(self):
+        self.slots = [None] * self.size
+
+    def new_search(self):
+        """Ages every stored entry, they stay usable but are replaced first."""
+        self.generation += 1
+
+    def probe(self, key):
+        """Returns the entry stored for key, or None."""
+        self.probes += 1
+        entry = self.slots[key & self.mask]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        return None
+
+    def store(self, key, depth, score, flag, move, ply=0):
+        score = score_from_root(score, ply)
+        index = key & self.mask
+        entry = self.slots[index]
+        if entry is None or entry[0] == key or depth >= entry[1] or entry[5] != self.generation:
+            self.slots[index] = (key, depth, score, flag, move, self.generation)
+            self.stores += 1
+
+    def lookup(self, key, depth, alpha, beta, ply=0):
+        """
+        Probes the table for a search of key to the given depth, ply plies
+        below the root.
+
+        Returns (score, alpha, beta, move): score is not None when the stored
+        result alone decides the node, otherwise alpha and beta are narrowed by
+        any usable bound and move is the stored best move (or None).
+        """
+        entry = self.probe(key)
+        if entry is None:
+            return None, alpha, beta, None
+
+        move = entry[4]
+        if entry[1] >= depth:
+            score = score_to_root(entry[2], ply)
+            flag = entry[3]
+            if flag == EXACT:
+                return score, alpha, beta, move
+            if flag == LOWER:
+                alpha = max(alpha, score)
+            elif flag == UPPER:
+                beta = min(beta, score)
+            if alpha >= beta:
+                return score, alpha, beta, move
+
+        return None, alpha, beta, move
+
+    def hit_rate(self):
+        if not self.probes:
+            return 0.0
+        return self.hits / self.probes
+
+    def usage(self):
+        """Fraction of slots in use."""
+        return sum(1 for entry in self.slots if entry is not None) / self.size
@@ -1,5 +1,3 @@
-import copy
-
 """
 get number from str
 """
@@ -21,23 +19,24 @@ returns the manhattan distance betweeen two points
 def manhattan_distance(pos1, pos2):
     x1, y1 = pos1
     x2, y2 = pos2
-    return (x2-x1)+(y2-y1)
+    return abs(x2-x1)+abs(y2-y1)
 
 
 """
 returns the best move to make at the movement
 """
-def greedy_move(board_dict, moves, colour, num_black, num_white):
+def greedy_move(board, moves, colour):
 
     max_move = moves[0]
     max_score = -99999
 
     for move in moves:
-        # make every move
-        future_board, future_black, future_white = make_move(copy.deepcopy(board_dict), move, num_black, num_white)
+        # make every move on the board, then take it back after scoring it
+        undo = board.make_move(move)
 
         # get an eval for it
-        score = eval(colour, future_black, future_white)
+        score = board.eval(colour)
+        board.unmake_move(undo)
 
         # if max eval so far mark it as the best
         if score > max_score: